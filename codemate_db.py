@@ -0,0 +1,161 @@
+# Python wrapper around CodeMateDB (js.db, the Gun.js key-value store)
+# setupPythonDatabase (script.js) writes this file into the Pyodide filesystem
+# and binds `db = Database()` in the globals user code runs in
+
+import json
+from collections import OrderedDict
+
+class HashIndexLoading(Exception):
+    """A namespace's field index is still loading from Gun.js; retry shortly"""
+
+class LRUCache:
+    """In-process LRU cache bounded by an estimated memory budget in bytes"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key, value):
+        self.discard(key)
+        try:
+            size = len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.size -= entry[1]
+
+    def discard_namespace(self, namespace):
+        for key in [key for key in self.entries if key[0] == namespace]:
+            self.discard(key)
+
+def _to_py(value):
+    """Convert a JS proxy to Python; Python values pass through"""
+    return value.to_py() if hasattr(value, 'to_py') else value
+
+class Database:
+    def __init__(self, cache_bytes=1024 * 1024):
+        import js
+        from pyodide.ffi import create_proxy
+        self.js_db = js.db
+        self.cache = LRUCache(cache_bytes)
+        # The JS field indexes hold the values this cache converts, so they
+        # get the same budget
+        self.js_db.hashIndexMaxBytes = cache_bytes
+        self._hash_listener = create_proxy(self._on_hash_change)
+        self.js_db.onHashChange(self._hash_listener)
+
+    def _on_hash_change(self, namespace, field):
+        """Drop cached fields that changed in Gun.js, including on other peers.
+
+        A null field means the namespace's index was evicted, and with it
+        every notification for that namespace.
+        """
+        if field is None:
+            self.cache.discard_namespace(namespace)
+        else:
+            self.cache.discard((namespace, field))
+
+    def set(self, key, value):
+        """Set a key-value pair in the database"""
+        return self.js_db.set(key, value)
+
+    def get(self, key):
+        """Get a value by key from the database"""
+        return self.js_db.get(key)
+
+    def delete(self, key):
+        """Delete a key from the database"""
+        return self.js_db.delete(key)
+
+    def list(self):
+        """List all data in the database"""
+        return self.js_db.list()
+
+    def push(self, array_key, value):
+        """Add to array"""
+        return self.js_db.push(array_key, value)
+
+    def increment(self, key, amount=1):
+        """Increment a numeric value"""
+        return self.js_db.increment(key, amount)
+
+    def hset(self, namespace, field, value):
+        """Set one field of a namespaced hash without rewriting the others"""
+        result = self.js_db.hset(namespace, field, value)
+        self.cache.put((namespace, field), value)
+        return result
+
+    def hget(self, namespace, field, default=None):
+        """Get one field of a namespaced hash, served from the LRU cache when possible.
+
+        Raises HashIndexLoading while the namespace is still loading.
+        """
+        missing = object()
+        value = self.cache.get((namespace, field), missing)
+        if value is missing:
+            ready, value = _to_py(self.js_db.hgetSync(namespace, field))
+            if not ready:
+                raise HashIndexLoading(namespace)
+            self.cache.put((namespace, field), value)
+        return default if value is None else value
+
+    def hdel(self, namespace, field):
+        """Delete one field of a namespaced hash"""
+        self.cache.discard((namespace, field))
+        return self.js_db.hdel(namespace, field)
+
+    def hscan(self, namespace, cursor='', count=10):
+        """Scan a namespaced hash in field order, count fields at a time.
+
+        Returns (next_cursor, {field: value}); pass next_cursor back to
+        continue. The cursor is the last field returned, so fields added
+        between calls don't shift the scan. An empty cursor means done.
+        Pages come from the JS side's live field index, so each one costs
+        O(log n + count) and never waits on a Promise. Raises
+        HashIndexLoading while the namespace is still loading, rather than
+        passing it off as empty.
+        """
+        next_cursor, items, ready = _to_py(self.js_db.hscanSync(namespace, cursor, max(1, count)))
+        if not ready:
+            raise HashIndexLoading(namespace)
+        for field, value in items.items():
+            self.cache.put((namespace, field), value)
+        return next_cursor, items
+
+    def hgetall(self, namespace):
+        """Get every field of a namespaced hash"""
+        result = {}
+        cursor = ''
+        while True:
+            cursor, items = self.hscan(namespace, cursor, count=100)
+            result.update(items)
+            if not cursor:
+                return result
+
+    def watch(self, key, callback):
+        """Watch for changes to a key"""
+        from pyodide.ffi import create_proxy
+        js_callback = create_proxy(callback)
+        return self.js_db.watch(key, js_callback)
+
+    def query(self, filter_func):
+        """Simple query with filter function"""
+        from pyodide.ffi import create_proxy
+        js_filter = create_proxy(filter_func)
+        return self.js_db.query(js_filter)
@@ -0,0 +1,226 @@
+# Opt-in per-request sampling profiler for CodeMate Flask apps
+# runFlaskApp (script.js) writes this file into the Pyodide filesystem next to
+# codemate_wsgi.py. Apps enable it with:
+#
+#     import codemate_profiler
+#     codemate_profiler.install(app)     # token from CODEMATE_PROFILE_TOKEN
+#
+# The environment variable is read on every request, so set_admin_token() (or
+# the terminal's "profile token <token>" command in the browser) turns
+# profiling on or off while the app keeps running.
+#
+# A request is profiled when it carries the admin token in the
+# X-CodeMate-Profile header or the ?__profile= query flag. Its collapsed stacks
+# (flamegraph.pl / speedscope input) are stored under the id returned in the
+# X-Profile-Id header. ?__profile=<token>&__profile_output=collapsed returns
+# them instead of the response body. GET /api/debug/profile serves the rolling
+# aggregate of recent profiles, and /api/debug/profile/<id> serves one profile.
+#
+# Profiles are kept in memory by the process that recorded them. Under
+# serve_multiprocess.py every worker has its own store, so the aggregate covers
+# only the worker that answers. Profile ids start with the recording worker's
+# pid, and a lookup that reaches another worker returns 404 instead of a
+# different request's profile.
+
+import collections
+import hmac
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qs
+
+PROFILE_HEADER = 'HTTP_X_CODEMATE_PROFILE'
+PROFILE_QUERY_FLAG = '__profile'
+PROFILE_ROUTE = '/api/debug/profile'
+TOKEN_ENV = 'CODEMATE_PROFILE_TOKEN'
+# Minimum time between samples, in seconds
+SAMPLE_INTERVAL = 0.001
+# Profiles kept for the rolling aggregate
+MAX_STORED_PROFILES = 50
+
+class StackSampler:
+    """Samples the current thread's Python stack via sys.setprofile.
+
+    Works without threads or signals, so it also runs under Pyodide. On each
+    call/return event, once SAMPLE_INTERVAL has passed since the last sample,
+    the current stack is charged with the elapsed time in microseconds.
+    Stacks are recorded from the frame that called start() downwards.
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.last = 0.0
+        self.previous = None
+        self.root = None
+
+    def _hook(self, frame, event, arg):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        if elapsed >= self.interval:
+            self.stacks[self._collapse(frame)] += int(elapsed * 1_000_000)
+            self.last = now
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None and frame is not self.root:
+            code = frame.f_code
+            names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def start(self):
+        self.previous = sys.getprofile()
+        self.root = sys._getframe(1)
+        self.last = time.perf_counter()
+        sys.setprofile(self._hook)
+
+    def stop(self):
+        sys.setprofile(self.previous)
+        self.root = None
+
+def collapsed(stacks):
+    """Format a stack counter as collapsed-stack text, heaviest first"""
+    return ''.join(f'{stack} {weight}\n' for stack, weight in stacks.most_common())
+
+class Profiler:
+    """Stores recent request profiles and their rolling aggregate"""
+    def __init__(self, admin_token, interval=SAMPLE_INTERVAL):
+        self.admin_token = admin_token
+        self.interval = interval
+        self.profiles = collections.OrderedDict()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def authorized(self, token):
+        admin_token = self.admin_token or os.environ.get(TOKEN_ENV)
+        # compare_digest rejects non-ASCII str, so compare the encoded bytes
+        if not admin_token or not token:
+            return False
+        return hmac.compare_digest(token.encode('utf-8'), admin_token.encode('utf-8'))
+
+    def record(self, method, path, stacks, duration):
+        with self.lock:
+            profile_id = f'{os.getpid()}-{next(self.ids)}'
+            self.profiles[profile_id] = {
+                'id': profile_id,
+                'method': method,
+                'path': path,
+                'duration_ms': round(duration * 1000, 3),
+                'stacks': stacks
+            }
+            while len(self.profiles) > MAX_STORED_PROFILES:
+                self.profiles.popitem(last=False)
+        return profile_id
+
+    def aggregate(self):
+        total = collections.Counter()
+        with self.lock:
+            for profile in self.profiles.values():
+                total.update(profile['stacks'])
+        return total
+
+class ProfilerMiddleware:
+    """WSGI middleware that profiles requests flagged with the admin token"""
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        token = environ.get(PROFILE_HEADER) or query.get(PROFILE_QUERY_FLAG, [''])[0]
+
+        if path == PROFILE_ROUTE or path.startswith(PROFILE_ROUTE + '/'):
+            if not self.profiler.authorized(token):
+                return self._respond(start_response, '403 FORBIDDEN', {'error': 'Profiling requires the admin token'})
+            return self._serve_profile(path, query, start_response)
+
+        if not token:
+            return self.app(environ, start_response)
+        if not self.profiler.authorized(token):
+            return self._respond(start_response, '403 FORBIDDEN', {'error': 'Profiling requires the admin token'})
+
+        captured = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            return written.append
+
+        # Iterate the response inside the sampling window so streamed bodies count
+        sampler = StackSampler(self.profiler.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            result = self.app(environ, capture)
+            try:
+                body = b''.join(itertools.chain(written, result))
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - started
+        profile_id = self.profiler.record(environ.get('REQUEST_METHOD', 'GET'), path, sampler.stacks, duration)
+
+        if query.get('__profile_output', [''])[0] == 'collapsed':
+            body = collapsed(sampler.stacks).encode('utf-8')
+            headers = [('Content-Type', 'text/plain; charset=utf-8')]
+        else:
+            headers = [(name, value) for name, value in captured['headers'] if name.lower() != 'content-length']
+        headers += [('Content-Length', str(len(body))), ('X-Profile-Id', profile_id)]
+        start_response(captured['status'], headers)
+        return [body]
+
+    def _serve_profile(self, path, query, start_response):
+        profile_id = path[len(PROFILE_ROUTE) + 1:]
+        if profile_id:
+            with self.profiler.lock:
+                profile = self.profiler.profiles.get(profile_id)
+            if profile is None:
+                error = 'Profile not found'
+                if not profile_id.startswith(f'{os.getpid()}-'):
+                    error += ' in this worker process'
+                return self._respond(start_response, '404 NOT FOUND', {'error': error})
+            stacks = profile['stacks']
+        else:
+            stacks = self.profiler.aggregate()
+
+        if query.get('format', ['collapsed'])[0] == 'json':
+            with self.profiler.lock:
+                recent = [{key: value for key, value in profile.items() if key != 'stacks'}
+                          for profile in self.profiler.profiles.values()]
+            return self._respond(start_response, '200 OK', {'pid': os.getpid(), 'profiles': recent,
+                                                            'stacks': dict(stacks.most_common())})
+
+        body = collapsed(stacks).encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'text/plain; charset=utf-8'), ('Content-Length', str(len(body)))])
+        return [body]
+
+    @staticmethod
+    def _respond(start_response, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+def install(app, admin_token=None):
+    """Wrap a Flask app's WSGI callable with the profiler and return it.
+
+    Profiling stays disabled unless an admin token is given here or set in
+    the CODEMATE_PROFILE_TOKEN environment variable, which is checked on
+    every request.
+    """
+    profiler = Profiler(admin_token)
+    app.wsgi_app = ProfilerMiddleware(app.wsgi_app, profiler)
+    return profiler
+
+def set_admin_token(token):
+    """Set the token for profilers installed without one; None disables them"""
+    if token:
+        os.environ[TOKEN_ENV] = token
+    else:
+        os.environ.pop(TOKEN_ENV, None)
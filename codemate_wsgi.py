@@ -0,0 +1,91 @@
+# WSGI adapter for running Flask-lite apps inside CodeMate
+# runFlaskApp (script.js) writes this file into the Pyodide filesystem and
+# calls handle_request() for every request made from the preview iframe
+
+import io
+import sys
+
+def build_environ(method, path, query_string='', headers=None, body=b''):
+    """Build a complete WSGI environ from a compact request record"""
+    environ = {
+        'REQUEST_METHOD': method.upper(),
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path or '/',
+        'QUERY_STRING': query_string or '',
+        'SERVER_NAME': '127.0.0.1',
+        'SERVER_PORT': '5000',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        # BytesIO shares the bytes object's buffer until written to, so the
+        # body is not copied again on its way to the app
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if body:
+        environ['CONTENT_LENGTH'] = str(len(body))
+
+    for name, value in (headers or {}).items():
+        key = name.upper().replace('-', '_')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key != 'CONTENT_LENGTH':
+            environ['HTTP_' + key] = value
+    return environ
+
+def _as_bytes(body):
+    """Normalize a request body passed from JavaScript or Python to bytes"""
+    if body is None:
+        return b''
+    if isinstance(body, bytes):
+        return body
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    if hasattr(body, 'to_bytes'):
+        # Uint8Array proxy: one copy out of the JavaScript heap
+        return body.to_bytes()
+    return bytes(body)
+
+def handle_request(app, method='GET', path='/', query_string='', headers=None, body=None):
+    """Run one request through a WSGI app.
+
+    Returns (status_code, headers, body) with the headers as a dict and the
+    whole response iterable joined into a single bytes object.
+    """
+    if headers is not None and hasattr(headers, 'to_py'):
+        headers = headers.to_py()
+    environ = build_environ(method, path, query_string, headers, _as_bytes(body))
+
+    # Per-request state, so interleaved requests never share status or headers
+    response = {}
+    chunks = []
+
+    def start_response(status, response_headers, exc_info=None):
+        if exc_info and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response['status'] = status
+        response['headers'] = response_headers
+        return chunks.append
+
+    result = app(environ, start_response)
+    try:
+        for chunk in result:
+            if chunk:
+                chunks.append(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+    response_headers = {}
+    for name, value in response.get('headers', []):
+        if name in response_headers:
+            response_headers[name] += ', ' + value
+        else:
+            response_headers[name] = value
+
+    status_code = int(response.get('status', '500').split(' ', 1)[0])
+    return status_code, response_headers, b''.join(chunks)
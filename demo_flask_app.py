@@ -1,9 +1,15 @@
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, render_template_string, jsonify, request
 import random
 import os
 
+import codemate_profiler
+from codemate_db import HashIndexLoading
+
 app = Flask(__name__)
 
+# Opt-in per-request profiling for admins, see codemate_profiler.py
+codemate_profiler.install(app)
+
 # Inline template since CodeMate may not have proper template directory structure
 TEMPLATE = """
 <!DOCTYPE html>
@@ -196,17 +202,33 @@ def db_test():
             'status': 'error'
         })
 
+def _still_loading():
+    """Response while the users namespace is still loading from Gun.js"""
+    return jsonify({'message': 'Users are still loading, try again shortly', 'status': 'error'}), 503, {'Retry-After': '1'}
+
+def migrate_users_blob():
+    """Move users from the old single 'users' blob into the users namespace"""
+    users_data = db.get('users')
+    if isinstance(users_data, dict) and users_data:
+        for user_id, user in users_data.items():
+            db.hset('users', user_id, user)
+        db.delete('users')
+
 @app.route('/api/db/users')
 def db_users():
     try:
         if 'db' in globals():
-            # Try to get users from the database
-            users_data = db.get('users') or {}
-            user_count = len(users_data)
+            migrate_users_blob()
+            
+            # Page through the users namespace instead of loading every user
+            cursor = request.args.get('cursor', '')
+            count = max(1, min(int(request.args.get('count', 50)), 500))
+            next_cursor, users_data = db.hscan('users', cursor, count)
             
             return jsonify({
-                'count': user_count,
+                'count': len(users_data),
                 'users': users_data,
+                'cursor': next_cursor,
                 'status': 'success'
             })
         else:
@@ -216,6 +238,8 @@ def db_users():
                 'users': {},
                 'status': 'error'
             })
+    except HashIndexLoading:
+        return _still_loading()
     except Exception as e:
         return jsonify({
             'message': f'Error retrieving users: {str(e)}',
@@ -224,6 +248,30 @@ def db_users():
             'status': 'error'
         })
 
+@app.route('/api/db/users/<user_id>', methods=['GET', 'PUT'])
+def db_user(user_id):
+    try:
+        if 'db' not in globals():
+            return jsonify({'message': 'Database not available', 'status': 'error'})
+        
+        if request.method == 'PUT':
+            # Writes only this user's field, not the whole users collection
+            user = request.get_json()
+            db.hset('users', user_id, user)
+            return jsonify({'user': user, 'status': 'success'})
+        
+        user = db.hget('users', user_id)
+        if user is None:
+            return jsonify({'message': 'User not found', 'status': 'error'}), 404
+        return jsonify({'user': user, 'status': 'success'})
+    except HashIndexLoading:
+        return _still_loading()
+    except Exception as e:
+        return jsonify({
+            'message': f'Error accessing user: {str(e)}',
+            'status': 'error'
+        })
+
 @app.route('/test')
 def test():
     return "Flask is working in CodeMate! ✅"
@@ -0,0 +1,354 @@
+# Offline stand-in for CodeMate's `js` module
+# Lets the Flask examples and test_sql_db.py run on a plain Python install:
+# js.sqlDb is backed by stdlib sqlite3 and mirrors CodeMateSQLDB in script.js,
+# js.db is an in-memory stand-in for the Gun.js key-value database. Also
+# provides pyodide.ffi's proxy helpers, for codemate_db.py.
+#
+#     import fake_js
+#     js = fake_js.install()          # or install('app.db') for a file database
+
+import bisect
+import contextlib
+import json
+import sqlite3
+import sys
+import time
+import types
+
+# Matches SQL_BUDGET_GRACE_MS in script.js: how long past its budget a cursor
+# fetch may run before the host kills the worker
+BUDGET_GRACE_MS = 250
+
+class QueryResult:
+    """One statement's result, shaped like sql.js: .columns and .values"""
+    def __init__(self, columns, values, truncated=False):
+        self.columns = columns
+        self.values = values
+        self.truncated = truncated
+
+class CursorPage:
+    """One page from fetchCursor: .values and .done"""
+    def __init__(self, values, done):
+        self.values = values
+        self.done = done
+
+class OpenedCursor:
+    """Result of openCursor: .cursorId and .columns"""
+    def __init__(self, cursor_id, columns):
+        self.cursorId = cursor_id
+        self.columns = columns
+
+def split_statements(sql):
+    """Split a SQL script into statements, keeping trigger bodies whole"""
+    statements = []
+    start = 0
+    end = sql.find(';')
+    while end != -1:
+        candidate = sql[start:end + 1]
+        if sqlite3.complete_statement(candidate):
+            statements.append(candidate)
+            start = end + 1
+        end = sql.find(';', end + 1)
+    if sql[start:].strip():
+        statements.append(sql[start:])
+    return statements
+
+def _js_type(value):
+    """The JavaScript typeof a value would have after crossing into JS"""
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    return 'object'
+
+def decode_kv_value(value, value_type):
+    """Decode a kv_store value the way CodeMateSQLDB.get() does"""
+    if value_type == 'object':
+        try:
+            return json.loads(value)
+        except (TypeError, ValueError):
+            return value
+    if value_type == 'number':
+        return float(value)
+    if value_type == 'boolean':
+        return value == 'true'
+    return value
+
+class SQLDatabase:
+    """sqlite3-backed stand-in for CodeMateSQLDB (js.sqlDb)"""
+    def __init__(self, path=':memory:'):
+        # Autocommit, so BEGIN/COMMIT inside scripts behave as in sql.js
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.cursors = {}
+        # Cursors whose statement hasn't run yet, with its SQL
+        self.pending_cursors = {}
+        self.next_cursor_id = 1
+        self.isReady = True
+        self.createDefaultTables()
+
+    def createDefaultTables(self):
+        self.exec('''
+            CREATE TABLE IF NOT EXISTS kv_store (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                type TEXT,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TRIGGER IF NOT EXISTS update_kv_store_updated_at
+            AFTER UPDATE ON kv_store FOR EACH ROW
+            BEGIN
+                UPDATE kv_store SET updated_at = CURRENT_TIMESTAMP WHERE key = OLD.key;
+            END;
+        ''')
+
+    def _run(self, sql, params=None, max_rows=0):
+        results = []
+        cursor = self.connection.cursor()
+        for index, statement in enumerate(split_statements(sql)):
+            # Like sql.js, parameters bind to the first statement only
+            cursor.execute(statement, params if params and index == 0 else ())
+            if cursor.description is None:
+                continue
+            columns = [column[0] for column in cursor.description]
+            if max_rows:
+                rows = cursor.fetchmany(max_rows + 1)
+                truncated = len(rows) > max_rows
+                values = [list(row) for row in rows[:max_rows]]
+            else:
+                truncated = False
+                values = [list(row) for row in cursor.fetchall()]
+            results.append(QueryResult(columns, values, truncated))
+        return results
+
+    def exec(self, sql, params=None):
+        """Run one or more statements; returns results of those that yield rows.
+
+        Like CodeMateSQLDB.exec, persists afterwards, which closes every open
+        cursor.
+        """
+        results = self._run(sql, params)
+        self.persist()
+        return results
+
+    def execNoPersist(self, sql, params=None):
+        """Run a write without exporting; the browser saves on persist()"""
+        return self._run(sql, params)
+
+    def persist(self):
+        """Mirror CodeMateSQLDB.persist(): the export frees every open cursor"""
+        self._drop_cursors()
+        return True
+
+    def query(self, sql, params=None):
+        """Run a query; same as exec, kept for parity with the JS API"""
+        return self._run(sql, params)
+
+    @contextlib.contextmanager
+    def _budget(self, timeoutMs):
+        """Interrupt statements that run past `timeoutMs` milliseconds.
+
+        sqlite3's progress handler stands in for CodeMateSQLDB terminating and
+        restarting its worker, so an interrupted statement also loses every
+        open cursor, as in the browser.
+        """
+        deadline = time.monotonic() + timeoutMs / 1000 if timeoutMs else None
+        self.connection.set_progress_handler(
+            lambda: deadline is not None and time.monotonic() > deadline, 1000)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if 'interrupted' not in str(e):
+                raise
+            self._drop_cursors()
+            raise RuntimeError(f'interrupted: query exceeded its {timeoutMs} ms budget') from e
+        finally:
+            self.connection.set_progress_handler(None, 0)
+
+    def queryWithBudget(self, sql, timeoutMs, maxRows):
+        """Run a query under a time budget and a per-statement row cap"""
+        with self._budget(timeoutMs):
+            return self._run(sql, max_rows=maxRows)
+
+    def _drop_cursors(self):
+        """Close every open cursor, like a worker restart or export does"""
+        for cursor in self.cursors.values():
+            cursor.close()
+        self.cursors.clear()
+        self.pending_cursors.clear()
+
+    def openCursor(self, sql):
+        """Open a cursor; like the worker's prepare, the query runs on first fetch"""
+        sql = sql.strip().rstrip(';')
+        cursor = self.connection.cursor()
+        cursor_id = self.next_cursor_id
+        self.next_cursor_id += 1
+        try:
+            # Column names without running the query
+            probe = self.connection.execute(f'SELECT * FROM ({sql}) LIMIT 0')
+            columns = [column[0] for column in probe.description]
+            self.pending_cursors[cursor_id] = sql
+        except sqlite3.Error:
+            # Not usable as a subquery (PRAGMA and the like); run it now
+            cursor.execute(sql)
+            columns = [column[0] for column in cursor.description] if cursor.description else []
+        self.cursors[cursor_id] = cursor
+        return OpenedCursor(cursor_id, columns)
+
+    def fetchCursor(self, cursorId, n, timeoutMs=0):
+        """Fetch up to n rows, like the worker: a page cut short by the deadline
+        is still valid, and a step that overruns it by the grace period is
+        interrupted"""
+        cursor = self.cursors.get(cursorId)
+        if cursor is None:
+            raise ValueError(f'Unknown cursor: {cursorId}')
+        deadline = time.monotonic() + timeoutMs / 1000 if timeoutMs else None
+        rows = []
+        done = False
+        with self._budget(timeoutMs + BUDGET_GRACE_MS if timeoutMs else 0):
+            if cursorId in self.pending_cursors:
+                cursor.execute(self.pending_cursors.pop(cursorId))
+            while len(rows) < n:
+                row = cursor.fetchone()
+                if row is None:
+                    done = True
+                    break
+                rows.append(list(row))
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+        if done:
+            self.closeCursor(cursorId)
+        return CursorPage(rows, done)
+
+    def closeCursor(self, cursorId):
+        cursor = self.cursors.pop(cursorId, None)
+        self.pending_cursors.pop(cursorId, None)
+        if cursor is not None:
+            cursor.close()
+        return True
+
+    def getTables(self):
+        results = self.query("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+        return [row[0] for row in results[0].values] if results else []
+
+    def set(self, key, value):
+        value_type = _js_type(value)
+        if value_type == 'object':
+            value_str = json.dumps(value)
+        elif value_type == 'boolean':
+            value_str = 'true' if value else 'false'
+        else:
+            value_str = str(value)
+        self.exec('''
+            INSERT INTO kv_store (key, value, type) VALUES (:key, :value, :type)
+            ON CONFLICT(key) DO UPDATE SET value=excluded.value, type=excluded.type, updated_at=CURRENT_TIMESTAMP
+        ''', {'key': key, 'value': value_str, 'type': value_type})
+        return value
+
+    def get(self, key):
+        results = self.query('SELECT value, type FROM kv_store WHERE key = :key', {'key': key})
+        if not results or not results[0].values:
+            return None
+        value, value_type = results[0].values[0]
+        return decode_kv_value(value, value_type)
+
+    def delete(self, key):
+        self.exec('DELETE FROM kv_store WHERE key = :key', {'key': key})
+        return True
+
+    def list(self):
+        results = self.query('SELECT key, value, type, updated_at FROM kv_store ORDER BY updated_at DESC')
+        data = {}
+        for key, value, value_type, timestamp in (results[0].values if results else []):
+            data[key] = {'value': decode_kv_value(value, value_type), 'type': value_type, 'timestamp': timestamp}
+        return data
+
+class KVDatabase:
+    """In-memory stand-in for CodeMateDB (js.db, Gun.js)"""
+    def __init__(self):
+        self.data = {}
+        self.hashes = {}
+        self.hash_listeners = []
+        self.hashIndexMaxBytes = 1024 * 1024
+        # Namespaces whose index is still loading from Gun.js
+        self.loading = set()
+
+    def set(self, key, value):
+        self.data[key] = {'value': value, 'timestamp': int(time.time() * 1000), 'type': _js_type(value)}
+        return value
+
+    def get(self, key):
+        item = self.data.get(key)
+        return item['value'] if item else None
+
+    def delete(self, key):
+        self.data.pop(key, None)
+        return True
+
+    def list(self):
+        return dict(self.data)
+
+    def push(self, array_key, value):
+        current = self.get(array_key) or []
+        if not isinstance(current, list):
+            raise TypeError(f'Key "{array_key}" is not an array')
+        return self.set(array_key, current + [value])
+
+    def increment(self, key, amount=1):
+        return self.set(key, (self.get(key) or 0) + amount)
+
+    def hset(self, namespace, field, value):
+        """Set a field; also how tests stand in for a write from another peer"""
+        self.hashes.setdefault(namespace, {})[field] = value
+        self._notify_hash_change(namespace, field)
+        return value
+
+    def hget(self, namespace, field):
+        return self.hashes.get(namespace, {}).get(field)
+
+    def hgetSync(self, namespace, field):
+        value = self.hget(namespace, field)
+        return [namespace not in self.loading or value is not None, value]
+
+    def hdel(self, namespace, field):
+        self.hashes.get(namespace, {}).pop(field, None)
+        self._notify_hash_change(namespace, field)
+        return True
+
+    def onHashChange(self, listener):
+        self.hash_listeners.append(listener)
+
+    def _notify_hash_change(self, namespace, field):
+        for listener in self.hash_listeners:
+            listener(namespace, field)
+
+    def hkeys(self, namespace):
+        return list(self.hashes.get(namespace, {}))
+
+    def hscanSync(self, namespace, cursor, count):
+        fields = sorted(self.hashes.get(namespace, {}))
+        start = bisect.bisect_right(fields, cursor) if cursor else 0
+        page = fields[start:start + max(1, count)]
+        next_cursor = page[-1] if start + max(1, count) < len(fields) else ''
+        items = {field: self.hashes[namespace][field] for field in page}
+        return [next_cursor, items, namespace not in self.loading]
+
+def install(path=':memory:'):
+    """Register a fresh fake `js` module in sys.modules and return it"""
+    module = types.ModuleType('js')
+    module.sqlDb = SQLDatabase(path)
+    module.db = KVDatabase()
+    sys.modules['js'] = module
+    try:
+        import pyodide.ffi
+    except ImportError:
+        # Python callables reach the fake JS objects as they are
+        ffi = types.ModuleType('pyodide.ffi')
+        ffi.create_proxy = lambda obj: obj
+        ffi.to_js = lambda obj, **kwargs: obj
+        package = types.ModuleType('pyodide')
+        package.ffi = ffi
+        sys.modules['pyodide'] = package
+        sys.modules['pyodide.ffi'] = ffi
+    return module
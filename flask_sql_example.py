@@ -1,12 +1,66 @@
 # Flask + SQL Database Example for CodeMate
 # This shows how to use the SQL database with Flask applications
 
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, render_template_string, stream_with_context
+import csv
+import io
 import json
 import asyncio
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import codemate_profiler
 
 app = Flask(__name__)
 
+# Opt-in per-request profiling for admins, see codemate_profiler.py
+codemate_profiler.install(app)
+
+# Budgets for ad-hoc /api/query console queries, so one heavy query can't
+# stall every other route sharing the database
+QUERY_TIMEOUT_MS = 2000
+QUERY_MAX_ROWS = 1000
+QUERY_MAX_CONCURRENT = 2
+_query_slots = threading.BoundedSemaphore(QUERY_MAX_CONCURRENT)
+
+# Server-side cursors for paging through large /api/query results. Cursors are
+# kept in least-recently-used order and closed when idle for too long, or when
+# there are too many or their estimated footprint exceeds the memory budget
+CURSOR_PAGE_SIZE = 100
+CURSOR_IDLE_TTL = 300  # seconds
+CURSOR_MAX_OPEN = 32
+CURSOR_MEMORY_BUDGET = 8 * 1024 * 1024  # bytes, estimated from page sizes
+_cursors = OrderedDict()
+_cursors_lock = threading.Lock()
+
+# Rows per worker round trip when exporting, and per transaction when importing
+EXPORT_CHUNK_ROWS = 500
+IMPORT_CHUNK_ROWS = 500
+
+# Trigger-maintained state: imports drop these columns and rebuild them, and
+# refuse these tables outright
+DERIVED_COLUMNS = {'users': ('post_count',)}
+INTERNAL_TABLES = ('posts_feed', 'tombstones')
+
+# Fields returned by the user and post listings, in response order
+USER_FIELDS = ('id', 'name', 'email', 'created_at', 'updated_at')
+POST_FIELDS = ('id', 'title', 'content', 'created_at', 'author_name', 'updated_at')
+
+# Columns whose updates bump a row's updated_at for delta fetches
+TRACKED_COLUMNS = {
+    'users': ('name', 'email'),
+    'posts': ('title', 'content', 'user_id')
+}
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'sql': 'application/sql'
+}
+
 # HTML template with SQL integration
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -325,6 +379,9 @@ HTML_TEMPLATE = '''
                         });
                         
                         html += '</table>';
+                        if (result.truncated) {
+                            html += `<div class="error">Showing the first ${result.row_limit} rows only</div>`;
+                        }
                         resultDiv.innerHTML = html;
                     } else {
                         resultDiv.innerHTML = 
@@ -346,7 +403,7 @@ HTML_TEMPLATE = '''
             const samples = [
                 'SELECT * FROM users;',
                 'SELECT * FROM posts ORDER BY created_at DESC;',
-                'SELECT u.name, COUNT(p.id) as post_count FROM users u LEFT JOIN posts p ON u.id = p.user_id GROUP BY u.id;',
+                'SELECT name, post_count FROM users ORDER BY post_count DESC LIMIT 10;',
                 'SELECT p.title, p.content, u.name as author FROM posts p JOIN users u ON p.user_id = u.id;',
                 'SELECT COUNT(*) as total_users FROM users;'
             ];
@@ -387,6 +444,310 @@ HTML_TEMPLATE = '''
 def index():
     return render_template_string(HTML_TEMPLATE)
 
+def _rows(results):
+    """Return the value rows of a sqlDb result set (empty list if none)"""
+    if results and len(results) > 0 and results[0].values:
+        return results[0].values
+    return []
+
+def _ensure_column(sql_db, table, column, ddl):
+    """Add a column to a table created by an older version of this example"""
+    existing = [row[1] for row in _rows(sql_db.query(f'PRAGMA table_info({table})'))]
+    if column not in existing:
+        sql_db.exec(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}')
+        return True
+    return False
+
+def _ensure_trigger(sql_db, name, ddl):
+    """Create trigger `name` from `ddl`, replacing an outdated definition.
+
+    An unchanged trigger is left alone rather than recreated, so the firing
+    order of triggers on the same table doesn't shift with every init-db.
+    """
+    current = _rows(sql_db.query(f"SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = '{name}'"))
+    if current and current[0][0].split() == ddl.split():
+        return
+    sql_db.exec(f'DROP TRIGGER IF EXISTS {name};\n{ddl}')
+
+def _json_array(sql_db, fields, source_sql):
+    """Run `source_sql` and return its rows as a JSON array of objects.
+
+    The engine encodes each row with json_object() and joins them with
+    json_group_array(), so rows cross into Python as one string instead of
+    one list and one dict per row. `fields` name the columns of `source_sql`
+    and become the object keys.
+    """
+    row_sql = ', '.join(f"{_sql_literal(field)}, t.{_quote_ident(field)}" for field in fields)
+    results = sql_db.query(f'SELECT json_group_array(json_object({row_sql})) FROM ({source_sql}) t')
+    return _rows(results)[0][0]
+
+def _json_response(body, status=200):
+    """Wrap an already encoded JSON body in a response"""
+    return Response(body, status=status, mimetype='application/json')
+
+def _select_sql(fields, table):
+    """SELECT of `fields` from `table` aliased as `t`, ready for WHERE/ORDER BY"""
+    return f"SELECT {', '.join(f't.{field}' for field in fields)} FROM {table} t"
+
+def _parse_since(since):
+    """Parse a ?since= value into a rowid (int) or a UTC timestamp string.
+
+    Timestamps may use SQLite's 'YYYY-MM-DD HH:MM:SS' form, as returned in
+    `since`, or ISO 8601 with a 'T', fractional seconds and a zone. They are
+    normalized to the CURRENT_TIMESTAMP form so they compare correctly with
+    updated_at as strings. Raises ValueError for anything else.
+    """
+    if since.isdigit():
+        return int(since)
+    try:
+        parsed = datetime.fromisoformat(since)
+    except ValueError:
+        raise ValueError(f'since must be a row id or a timestamp, not {since!r}') from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+def _delta(sql_db, table, fields, select_sql, since):
+    """Build a ?since= delta response body for a listing endpoint.
+
+    `since` comes from _parse_since(). A rowid returns the rows appended after
+    it; a timestamp returns rows changed at or after it, plus tombstones for
+    rows deleted since then. The returned `since` is always a timestamp, so a
+    client that starts from a rowid picks up edits and deletes from then on.
+    `select_sql` must select the row id first, alias the table as `t`, and end
+    where a WHERE clause can be appended.
+    """
+    # Take the cursor before reading so changes made meanwhile are not skipped;
+    # rows touched in the same second are simply delivered twice
+    next_since = _rows(sql_db.query('SELECT CURRENT_TIMESTAMP'))[0][0]
+    if isinstance(since, int):
+        rows = _json_array(sql_db, fields, f'{select_sql} WHERE t.id > {since} ORDER BY t.id')
+        deleted = []
+    else:
+        safe_since = since.replace("'", "''")
+        rows = _json_array(sql_db, fields, f"{select_sql} WHERE t.updated_at >= '{safe_since}' ORDER BY t.updated_at")
+        deleted = [row[0] for row in _rows(sql_db.query(f'''
+            SELECT row_id FROM tombstones
+            WHERE table_name = '{table}' AND deleted_at >= '{safe_since}'
+        '''))]
+    return '{"rows":%s,"deleted":%s,"since":%s}' % (rows, json.dumps(deleted), json.dumps(next_since))
+
+def _table_columns(sql_db, table):
+    """Return the column names of `table`, or an empty list if it doesn't exist"""
+    safe_table = table.replace("'", "''")
+    return [row[1] for row in _rows(sql_db.query(f"PRAGMA table_info('{safe_table}')"))]
+
+def _table_type(sql_db, table):
+    """Return 'table' or 'view' for `table`, or None if there is no such object"""
+    safe_table = table.replace("'", "''")
+    rows = _rows(sql_db.query(f"SELECT type FROM sqlite_master WHERE name = '{safe_table}'"))
+    return rows[0][0] if rows else None
+
+def _rowid_column(sql_db, table, columns):
+    """Return a name that reads the rowid of `table`, or None if it has none.
+
+    A column may shadow `rowid`, so the other aliases are tried too; WITHOUT
+    ROWID tables reject all of them.
+    """
+    taken = {column.lower() for column in columns}
+    for alias in ('rowid', '_rowid_', 'oid'):
+        if alias in taken:
+            continue
+        try:
+            sql_db.query(f'SELECT {alias} FROM {_quote_ident(table)} LIMIT 0')
+        except Exception:
+            return None
+        return alias
+    return None
+
+def _quote_ident(name):
+    """Quote a table or column name for use in generated SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+def _sql_literal(value):
+    """Render a Python value as a SQL literal for generated statements"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "X'" + bytes(value).hex() + "'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+def _export_chunks(sql_db, table, columns, rowid, fmt):
+    """Yield an export of `table` one page of rowids at a time.
+
+    Pages are keyed on rowid instead of read through a worker cursor, because
+    any write exports the database and that frees the worker's cursors.
+    """
+    if fmt == 'ndjson':
+        # One JSON object per row, encoded by the engine
+        row_sql = 'json_object(' + ', '.join(f"{_sql_literal(column)}, {_quote_ident(column)}" for column in columns) + ')'
+    else:
+        row_sql = ', '.join(_quote_ident(column) for column in columns)
+    page_sql = f'SELECT {rowid}, {row_sql} FROM {_quote_ident(table)} WHERE {rowid} > %d ORDER BY {rowid} LIMIT {EXPORT_CHUNK_ROWS}'
+    insert_prefix = f'INSERT INTO {_quote_ident(table)} ({", ".join(_quote_ident(c) for c in columns)}) VALUES '
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(columns)
+    last_rowid = -2 ** 63
+    done = False
+    while not done:
+        rows = _rows(sql_db.query(page_sql % last_rowid))
+        done = len(rows) < EXPORT_CHUNK_ROWS
+        for row in rows:
+            if fmt == 'csv':
+                writer.writerow(row[1:])
+            elif fmt == 'ndjson':
+                buffer.write(row[1] + '\n')
+            else:
+                buffer.write(insert_prefix + '(' + ', '.join(_sql_literal(v) for v in row[1:]) + ');\n')
+        if rows:
+            last_rowid = rows[-1][0]
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def _import_chunks(sql_db, table, columns, records):
+    """Insert `records` (dicts) in chunked transactions, yielding progress lines.
+
+    Chunks are committed with execNoPersist, and the database is persisted
+    once at the end, so a large import doesn't export the whole database per
+    chunk.
+    """
+    derived = DERIVED_COLUMNS.get(table, ())
+    allowed = set(columns)
+    rows = 0
+    chunks = 0
+    statements = []
+    
+    def flush():
+        try:
+            sql_db.execNoPersist('BEGIN;\n' + '\n'.join(statements) + '\nCOMMIT;')
+        except Exception:
+            sql_db.execNoPersist('ROLLBACK;')
+            raise
+        statements.clear()
+    
+    try:
+        for record in records:
+            # Exports include derived columns; the triggers own their values
+            record = {name: value for name, value in record.items() if name not in derived}
+            unknown = set(record) - allowed
+            if unknown:
+                raise ValueError(f'Unknown column(s) for {table}: {", ".join(sorted(unknown))}')
+            names = ', '.join(_quote_ident(c) for c in record)
+            values = ', '.join(_sql_literal(v) for v in record.values())
+            statements.append(f'INSERT INTO {_quote_ident(table)} ({names}) VALUES ({values});')
+            if len(statements) >= IMPORT_CHUNK_ROWS:
+                flush()
+                rows += IMPORT_CHUNK_ROWS
+                chunks += 1
+                yield json.dumps({'rows': rows, 'chunks': chunks}) + '\n'
+        if statements:
+            count = len(statements)
+            flush()
+            rows += count
+            chunks += 1
+        result = {'done': True, 'rows': rows, 'chunks': chunks}
+    except Exception as e:
+        # Earlier chunks stay committed; report how far the import got
+        result = {'done': False, 'rows': rows, 'chunks': chunks, 'error': str(e)}
+    finally:
+        # Also runs when the client goes away mid-stream
+        if chunks:
+            _rebuild_derived(sql_db, table)
+            sql_db.persist()
+    yield json.dumps(result) + '\n'
+
+def _rebuild_derived(sql_db, table):
+    """Recompute trigger-maintained state after importing into `table`.
+
+    Posts imported before their authors got neither feed rows nor post
+    counts, so a users import recounts and backfills them.
+    """
+    if table == 'users':
+        sql_db.execNoPersist('''
+            UPDATE users SET post_count = (
+                SELECT COUNT(*) FROM posts p WHERE p.user_id = users.id
+            ) WHERE id IN (SELECT user_id FROM posts);
+            INSERT OR IGNORE INTO posts_feed
+            SELECT p.id, p.title, p.content, p.user_id, u.name, p.created_at, p.updated_at
+            FROM posts p
+            JOIN users u ON p.user_id = u.id;
+        ''')
+
+class _ServerCursor:
+    """A query cursor held open in the SQL worker between page fetches"""
+    def __init__(self, worker_id, columns):
+        self.worker_id = worker_id
+        self.columns = columns
+        self.last_used = time.monotonic()
+        self.size = 0
+
+def _evict_cursors(sql_db):
+    """Close idle cursors, then least recently used ones while over budget"""
+    now = time.monotonic()
+    evicted = []
+    with _cursors_lock:
+        for cursor_id, cursor in list(_cursors.items()):
+            if now - cursor.last_used > CURSOR_IDLE_TTL:
+                evicted.append(_cursors.pop(cursor_id))
+        total = sum(cursor.size for cursor in _cursors.values())
+        while _cursors and (len(_cursors) >= CURSOR_MAX_OPEN or total > CURSOR_MEMORY_BUDGET):
+            _, cursor = _cursors.popitem(last=False)
+            total -= cursor.size
+            evicted.append(cursor)
+    for cursor in evicted:
+        sql_db.closeCursor(cursor.worker_id)
+
+def _open_cursor(sql_db, query):
+    """Open a server-side cursor for `query` and return its public id"""
+    _evict_cursors(sql_db)
+    opened = sql_db.openCursor(query)
+    cursor_id = secrets.token_urlsafe(8)
+    with _cursors_lock:
+        _cursors[cursor_id] = _ServerCursor(opened.cursorId, list(opened.columns))
+    return cursor_id
+
+def _fetch_page(sql_db, cursor_id, n):
+    """Fetch up to `n` rows from an open cursor.
+
+    Returns (cursor, rows, done); cursor is None if the id is unknown or was
+    evicted. Exhausted cursors are closed by the worker and dropped here.
+    """
+    with _cursors_lock:
+        cursor = _cursors.get(cursor_id)
+        if cursor is None:
+            return None, [], True
+        _cursors.move_to_end(cursor_id)
+    try:
+        page = sql_db.fetchCursor(cursor.worker_id, n, QUERY_TIMEOUT_MS)
+    except Exception as e:
+        # The worker drops its cursors whenever the database is exported
+        # (after every write) or reloaded, and all of them when a fetch
+        # overruns its budget and the worker is restarted
+        message = str(e)
+        if not any(s in message for s in ('Unknown cursor', 'Statement closed', 'interrupted')):
+            raise
+        with _cursors_lock:
+            _cursors.pop(cursor_id, None)
+        if 'interrupted' in message:
+            raise
+        return None, [], True
+    cursor.last_used = time.monotonic()
+    if page.done:
+        with _cursors_lock:
+            _cursors.pop(cursor_id, None)
+    return cursor, page.values if page.values else [], bool(page.done)
+
+def _query_timeout():
+    """Response for a query or cursor fetch that overran QUERY_TIMEOUT_MS"""
+    return jsonify({'success': False, 'error': f'Query exceeded the {QUERY_TIMEOUT_MS} ms time limit'}), 408
+
 @app.route('/api/init-db', methods=['POST'])
 def init_database():
     """Initialize the database with tables"""
@@ -411,7 +772,9 @@ def init_database():
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
                 email TEXT UNIQUE NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                post_count INTEGER NOT NULL DEFAULT 0
             )
         ''')
         
@@ -423,10 +786,143 @@ def init_database():
                 content TEXT,
                 user_id INTEGER,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
         
+        # Deleted row ids, so delta clients can drop rows they already hold
+        sql_db.exec('''
+            CREATE TABLE IF NOT EXISTS tombstones (
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                deleted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (table_name, row_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_tombstones_deleted_at ON tombstones(table_name, deleted_at);
+        ''')
+        
+        # Change tracking for ?since= delta fetches. Only updates to the listed
+        # columns touch updated_at, so derived columns like users.post_count
+        # don't make unchanged rows reappear in deltas
+        for table, tracked in TRACKED_COLUMNS.items():
+            _ensure_column(sql_db, table, 'updated_at', 'DATETIME')
+            sql_db.exec(f'''
+                UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL;
+                CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table}(updated_at);
+                CREATE TRIGGER IF NOT EXISTS {table}_insert_updated_at
+                AFTER INSERT ON {table} FOR EACH ROW WHEN NEW.updated_at IS NULL
+                BEGIN
+                    UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_tombstone
+                AFTER DELETE ON {table} FOR EACH ROW
+                BEGIN
+                    INSERT OR REPLACE INTO tombstones (table_name, row_id) VALUES ('{table}', OLD.id);
+                END;
+            ''')
+            _ensure_trigger(sql_db, f'{table}_touch_updated_at', f'''
+                CREATE TRIGGER {table}_touch_updated_at
+                AFTER UPDATE OF {', '.join(tracked)} ON {table} FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+                BEGIN
+                    UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+                END
+            ''')
+        
+        # Denormalized feed so post listings need no join against users
+        feed_created = not _table_columns(sql_db, 'posts_feed')
+        sql_db.exec('''
+            CREATE TABLE IF NOT EXISTS posts_feed (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                content TEXT,
+                user_id INTEGER,
+                author_name TEXT,
+                created_at DATETIME,
+                updated_at DATETIME
+            );
+            CREATE INDEX IF NOT EXISTS idx_posts_feed_created_at ON posts_feed(created_at);
+            CREATE INDEX IF NOT EXISTS idx_posts_feed_updated_at ON posts_feed(updated_at);
+            CREATE INDEX IF NOT EXISTS idx_posts_feed_user_id ON posts_feed(user_id);
+            
+            CREATE TRIGGER IF NOT EXISTS posts_feed_insert
+            AFTER INSERT ON posts FOR EACH ROW
+            BEGIN
+                INSERT OR REPLACE INTO posts_feed
+                SELECT NEW.id, NEW.title, NEW.content, NEW.user_id, u.name,
+                       NEW.created_at, COALESCE(NEW.updated_at, CURRENT_TIMESTAMP)
+                FROM users u WHERE u.id = NEW.user_id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS posts_feed_delete
+            AFTER DELETE ON posts FOR EACH ROW
+            BEGIN
+                DELETE FROM posts_feed WHERE id = OLD.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS posts_feed_author_rename
+            AFTER UPDATE OF name ON users FOR EACH ROW WHEN NEW.name IS NOT OLD.name
+            BEGIN
+                UPDATE posts_feed SET author_name = NEW.name, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = NEW.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS posts_feed_author_delete
+            AFTER DELETE ON users FOR EACH ROW
+            BEGIN
+                INSERT OR REPLACE INTO tombstones (table_name, row_id)
+                SELECT 'posts', id FROM posts_feed WHERE user_id = OLD.id;
+                DELETE FROM posts_feed WHERE user_id = OLD.id;
+            END;
+        ''')
+        # Reads updated_at back from the row: when posts_touch_updated_at runs
+        # first, NEW.updated_at here still holds the value from before the edit
+        _ensure_trigger(sql_db, 'posts_feed_update', '''
+            CREATE TRIGGER posts_feed_update
+            AFTER UPDATE ON posts FOR EACH ROW
+            BEGIN
+                DELETE FROM posts_feed WHERE id = OLD.id;
+                INSERT INTO posts_feed
+                SELECT NEW.id, NEW.title, NEW.content, NEW.user_id, u.name, NEW.created_at,
+                       COALESCE((SELECT updated_at FROM posts WHERE id = NEW.id), CURRENT_TIMESTAMP)
+                FROM users u WHERE u.id = NEW.user_id;
+            END
+        ''')
+        if feed_created:
+            # One-time backfill; afterwards the triggers keep the feed current
+            sql_db.exec('''
+                INSERT OR IGNORE INTO posts_feed
+                SELECT p.id, p.title, p.content, p.user_id, u.name, p.created_at, p.updated_at
+                FROM posts p
+                JOIN users u ON p.user_id = u.id
+            ''')
+        
+        # Per-user post counts, maintained incrementally for the leaderboard
+        if _ensure_column(sql_db, 'users', 'post_count', 'INTEGER NOT NULL DEFAULT 0'):
+            # One-time backfill for databases created before the column existed
+            sql_db.exec('''
+                UPDATE users SET post_count = (
+                    SELECT COUNT(*) FROM posts p WHERE p.user_id = users.id
+                )
+            ''')
+        sql_db.exec('''
+            CREATE INDEX IF NOT EXISTS idx_users_post_count ON users(post_count DESC, id);
+            
+            CREATE TRIGGER IF NOT EXISTS posts_count_insert
+            AFTER INSERT ON posts FOR EACH ROW
+            BEGIN
+                UPDATE users SET post_count = post_count + 1 WHERE id = NEW.user_id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS posts_count_delete
+            AFTER DELETE ON posts FOR EACH ROW
+            BEGIN
+                UPDATE users SET post_count = post_count - 1 WHERE id = OLD.user_id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS posts_count_move
+            AFTER UPDATE OF user_id ON posts FOR EACH ROW WHEN NEW.user_id IS NOT OLD.user_id
+            BEGIN
+                UPDATE users SET post_count = post_count - 1 WHERE id = OLD.user_id;
+                UPDATE users SET post_count = post_count + 1 WHERE id = NEW.user_id;
+            END;
+        ''')
+        
         return jsonify({'success': True, 'message': 'Database initialized successfully'})
     
     except Exception as e:
@@ -480,20 +976,19 @@ def handle_users():
                 return jsonify({'success': False, 'error': f'Database error: {str(e)}'}), 400
         
         else:
-            # Get all users
-            results = sql_db.query('SELECT * FROM users ORDER BY created_at DESC')
-            users = []
+            select_sql = _select_sql(USER_FIELDS, 'users')
+            since = request.args.get('since')
             
-            if results and len(results) > 0 and results[0].values:
-                for row in results[0].values:
-                    users.append({
-                        'id': row[0],
-                        'name': row[1],
-                        'email': row[2],
-                        'created_at': row[3]
-                    })
+            if since:
+                # Only rows changed since the client's last fetch
+                try:
+                    since = _parse_since(since)
+                except ValueError as e:
+                    return jsonify({'success': False, 'error': str(e)}), 400
+                return _json_response(_delta(sql_db, 'users', USER_FIELDS, select_sql, since))
             
-            return jsonify(users)
+            # Get all users
+            return _json_response(_json_array(sql_db, USER_FIELDS, f'{select_sql} ORDER BY t.created_at DESC'))
     
     except Exception as e:
         import traceback
@@ -501,6 +996,27 @@ def handle_users():
         print(f"User handling error: {error_details}")
         return jsonify({'success': False, 'error': str(e), 'details': error_details}), 500
 
+@app.route('/api/users/top')
+def top_users():
+    """Get the users with the most posts"""
+    try:
+        import js
+        sql_db = js.sqlDb
+        
+        try:
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, 100))
+        
+        # Reads the first `limit` entries of idx_users_post_count, no GROUP BY
+        fields = ('id', 'name', 'email', 'post_count')
+        select_sql = _select_sql(fields, 'users')
+        return _json_response(_json_array(sql_db, fields, f'{select_sql} ORDER BY t.post_count DESC, t.id LIMIT {limit}'))
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/posts', methods=['GET', 'POST'])
 def handle_posts():
     """Handle post operations"""
@@ -526,26 +1042,20 @@ def handle_posts():
             return jsonify({'success': True, 'message': 'Post created successfully'})
         
         else:
-            # Get all posts with author names
-            results = sql_db.query('''
-                SELECT p.id, p.title, p.content, p.created_at, u.name as author_name
-                FROM posts p
-                JOIN users u ON p.user_id = u.id
-                ORDER BY p.created_at DESC
-            ''')
+            # Served from the trigger-maintained feed table, no join needed
+            select_sql = _select_sql(POST_FIELDS, 'posts_feed')
+            since = request.args.get('since')
             
-            posts = []
-            if results and len(results) > 0 and results[0].values:
-                for row in results[0].values:
-                    posts.append({
-                        'id': row[0],
-                        'title': row[1],
-                        'content': row[2],
-                        'created_at': row[3],
-                        'author_name': row[4]
-                    })
+            if since:
+                # Only posts changed since the client's last fetch
+                try:
+                    since = _parse_since(since)
+                except ValueError as e:
+                    return jsonify({'success': False, 'error': str(e)}), 400
+                return _json_response(_delta(sql_db, 'posts', POST_FIELDS, select_sql, since))
             
-            return jsonify(posts)
+            # Get all posts with author names (index range scan on created_at)
+            return _json_response(_json_array(sql_db, POST_FIELDS, f'{select_sql} ORDER BY t.created_at DESC, t.id DESC'))
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -563,20 +1073,59 @@ def execute_query():
         if not query:
             return jsonify({'success': False, 'error': 'Query is required'}), 400
         
-        # Execute the query
-        results = sql_db.query(query)
+        # Admission control: reject instead of queueing behind heavy queries
+        if not _query_slots.acquire(blocking=False):
+            return jsonify({'success': False, 'error': 'Too many queries running, try again shortly'}), 429, {'Retry-After': '1'}
+        
+        if data.get('cursor'):
+            # Open a server-side cursor and return only its first page
+            try:
+                page_size = max(1, min(int(data.get('page_size', CURSOR_PAGE_SIZE)), QUERY_MAX_ROWS))
+                cursor_id = _open_cursor(sql_db, query)
+                cursor, rows, done = _fetch_page(sql_db, cursor_id, page_size)
+            except Exception as e:
+                if 'interrupted' in str(e):
+                    return _query_timeout()
+                raise
+            finally:
+                _query_slots.release()
+            
+            response = jsonify({
+                'success': True,
+                'columns': cursor.columns if cursor else [],
+                'data': rows,
+                'cursor_id': None if done else cursor_id,
+                'done': done
+            })
+            if cursor:
+                cursor.size = len(response.get_data())
+            return response
+        
+        # Execute the query within its time and row budget
+        try:
+            results = sql_db.queryWithBudget(query, QUERY_TIMEOUT_MS, QUERY_MAX_ROWS)
+        except Exception as e:
+            if 'interrupted' in str(e):
+                return _query_timeout()
+            raise
+        finally:
+            _query_slots.release()
         
         if results and len(results) > 0:
             result_data = {
                 'success': True,
                 'columns': results[0].columns if results[0].columns else [],
-                'data': results[0].values if results[0].values else []
+                'data': results[0].values if results[0].values else [],
+                'truncated': bool(results[0].truncated),
+                'row_limit': QUERY_MAX_ROWS
             }
         else:
             result_data = {
                 'success': True,
                 'columns': [],
-                'data': []
+                'data': [],
+                'truncated': False,
+                'row_limit': QUERY_MAX_ROWS
             }
         
         return jsonify(result_data)
@@ -584,6 +1133,125 @@ def execute_query():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/query/cursor/<cursor_id>', methods=['GET', 'DELETE'])
+def query_cursor(cursor_id):
+    """Fetch the next page of an open query cursor, or close it"""
+    try:
+        import js
+        sql_db = js.sqlDb
+        
+        if request.method == 'DELETE':
+            with _cursors_lock:
+                cursor = _cursors.pop(cursor_id, None)
+            if cursor:
+                sql_db.closeCursor(cursor.worker_id)
+            return jsonify({'success': True})
+        
+        try:
+            n = max(1, min(int(request.args.get('n', CURSOR_PAGE_SIZE)), QUERY_MAX_ROWS))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'n must be an integer'}), 400
+        
+        if not _query_slots.acquire(blocking=False):
+            return jsonify({'success': False, 'error': 'Too many queries running, try again shortly'}), 429, {'Retry-After': '1'}
+        try:
+            cursor, rows, done = _fetch_page(sql_db, cursor_id, n)
+        except Exception as e:
+            if 'interrupted' in str(e):
+                return _query_timeout()
+            raise
+        finally:
+            _query_slots.release()
+        
+        if cursor is None:
+            return jsonify({'success': False, 'error': 'Cursor not found or expired'}), 404
+        
+        response = jsonify({
+            'success': True,
+            'columns': cursor.columns,
+            'data': rows,
+            'cursor_id': None if done else cursor_id,
+            'done': done
+        })
+        cursor.size = len(response.get_data())
+        return response
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/export/<table>')
+def export_table(table):
+    """Stream a table out as CSV, NDJSON or SQL INSERT statements"""
+    try:
+        import js
+        sql_db = js.sqlDb
+        
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}), 400
+        
+        columns = _table_columns(sql_db, table)
+        if not columns:
+            return jsonify({'success': False, 'error': f'Table not found: {table}'}), 404
+        # Pages are keyed on rowid, which views and WITHOUT ROWID tables lack
+        if _table_type(sql_db, table) != 'table':
+            return jsonify({'success': False, 'error': f'{table} is not a table'}), 400
+        rowid = _rowid_column(sql_db, table, columns)
+        if rowid is None:
+            return jsonify({'success': False, 'error': f'{table} has no rowid and cannot be exported'}), 400
+        
+        return Response(
+            _export_chunks(sql_db, table, columns, rowid, fmt),
+            mimetype=EXPORT_FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{table}.{fmt}"'}
+        )
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/import/<table>', methods=['POST'])
+def import_table(table):
+    """Bulk load CSV (with a header row) or NDJSON into an existing table"""
+    try:
+        import js
+        sql_db = js.sqlDb
+        
+        if table in INTERNAL_TABLES or table.startswith('sqlite_'):
+            return jsonify({'success': False, 'error': f'{table} is maintained by the database and cannot be imported into'}), 400
+        
+        columns = _table_columns(sql_db, table)
+        if not columns:
+            return jsonify({'success': False, 'error': f'Table not found: {table}'}), 404
+        if _table_type(sql_db, table) != 'table':
+            return jsonify({'success': False, 'error': f'{table} is not a table'}), 400
+        
+        fmt = request.args.get('format')
+        if not fmt:
+            fmt = 'ndjson' if 'json' in (request.content_type or '') else 'csv'
+        
+        # Parse the body incrementally instead of loading the whole upload
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        if fmt == 'csv':
+            reader = csv.reader(stream)
+            header = next(reader, None)
+            if not header:
+                return jsonify({'success': False, 'error': 'CSV header row is required'}), 400
+            # Empty CSV fields are imported as NULL, matching the CSV export
+            records = ({name: (value if value != '' else None) for name, value in zip(header, row)}
+                       for row in reader if row)
+        elif fmt == 'ndjson':
+            records = (json.loads(line) for line in stream if line.strip())
+        else:
+            return jsonify({'success': False, 'error': 'format must be csv or ndjson'}), 400
+        
+        return Response(
+            stream_with_context(_import_chunks(sql_db, table, columns, records)),
+            mimetype='application/x-ndjson'
+        )
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/stats')
 def get_stats():
     """Get database statistics"""
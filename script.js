@@ -1401,7 +1401,37 @@ async function runPythonCode() {
 
 // Flask-lite implementation based on Sippy-Cup
 let flaskApp = null;
-let pyodideStartResponse = null;
+let pyodideHandleRequest = null;
+
+// Admin token for codemate_profiler, kept across reloads and applied to the
+// running app immediately, so profiling needs no restart
+const PROFILE_TOKEN_KEY = 'CodeMate-profile-token';
+
+function setProfileToken(token) {
+    if (token) {
+        localStorage.setItem(PROFILE_TOKEN_KEY, token);
+    } else {
+        localStorage.removeItem(PROFILE_TOKEN_KEY);
+    }
+    applyProfileToken();
+}
+
+function applyProfileToken() {
+    if (!pyodideReady) return;
+    const os = pyodide.pyimport('os');
+    const environ = os.environ;
+    try {
+        const token = localStorage.getItem(PROFILE_TOKEN_KEY);
+        if (token) {
+            environ.set('CODEMATE_PROFILE_TOKEN', token);
+        } else if (environ.has('CODEMATE_PROFILE_TOKEN')) {
+            environ.delete('CODEMATE_PROFILE_TOKEN');
+        }
+    } finally {
+        environ.destroy();
+        os.destroy();
+    }
+}
 
 // Flask-lite CSS handler - exact Sippy-Cup implementation
 function getCss() {
@@ -1418,9 +1448,9 @@ with open("templates/style.css", "r") as file:
     }
 }
 
-// Flask-lite request handler using exact Sippy-Cup approach
-function handleRequest(requestMethod = "GET", route = "/") {
-    if (!flaskApp || !pyodideStartResponse) {
+// Flask-lite request handler, routed through the codemate_wsgi adapter
+function handleRequest(requestMethod = "GET", route = "/", body = null, requestHeaders = {}) {
+    if (!flaskApp || !pyodideHandleRequest) {
         return {
             value: {
                 body: new TextEncoder().encode("Flask app not initialized"),
@@ -1430,44 +1460,31 @@ function handleRequest(requestMethod = "GET", route = "/") {
         };
     }
 
+    let pyHeaders = null;
+    let result = null;
     try {
-        const environ = {
-            'wsgi.url_scheme': 'http',
-            'REQUEST_METHOD': requestMethod,
-            'PATH_INFO': route
-        };
-        
-        let r = flaskApp(pyodide.toPy(environ), pyodideStartResponse).toJs();
-        let response = r.__next__();
-        console.log('response before converting to string', response);
-        
-        response = response.toString();
-        response = response.slice(2, response.length - 1);
-        
-        // Clean up the response by removing escaped newlines and fixing formatting
-        response = response.replace(/\\n/g, '\n').replace(/\\'/g, "'").replace(/\\"/g, '"');
-        
-        // Inject CSS and trim whitespace
-        response = response.replace(`<link rel="stylesheet" href="style.css">`, `<style>${getCss()}</style>`);
-        response = response.trim();
-        
-        const textEncoder = new TextEncoder();
-        console.log(response);
-        console.log('sippycup response: ', textEncoder.encode(response));
-        
-        // Get headers and status from Python globals
-        const headers = pyodide.globals.get('headers').toJs();
-        const requestStatus = pyodide.globals.get('requestStatus');
-        
-        // Extract numeric status code (Flask returns "200 OK" format)
-        const statusCode = parseInt(requestStatus.toString().split(' ')[0]) || 200;
-        
-        console.log('Raw requestStatus:', requestStatus);
-        console.log('Parsed statusCode:', statusCode);
-        
+        const queryIndex = route.indexOf('?');
+        const path = queryIndex === -1 ? route : route.slice(0, queryIndex);
+        const queryString = queryIndex === -1 ? '' : route.slice(queryIndex + 1);
+        const bodyBytes = typeof body === 'string' ? new TextEncoder().encode(body) : body;
+
+        pyHeaders = pyodide.toPy(requestHeaders || {});
+        result = pyodideHandleRequest(flaskApp, requestMethod, path, queryString, pyHeaders, bodyBytes);
+        const [statusCode, headers, responseBody] = result.toJs({ dict_converter: Object.fromEntries });
+
+        // Inject CSS into HTML pages
+        let responseBytes = responseBody;
+        const contentType = headers['Content-Type'] || '';
+        if (contentType.startsWith('text/html')) {
+            const html = new TextDecoder().decode(responseBody)
+                .replace(`<link rel="stylesheet" href="style.css">`, `<style>${getCss()}</style>`)
+                .trim();
+            responseBytes = new TextEncoder().encode(html);
+        }
+
         return {
             value: {
-                body: textEncoder.encode(response),
+                body: responseBytes,
                 headers: headers,
                 status: statusCode
             },
@@ -1482,9 +1499,22 @@ function handleRequest(requestMethod = "GET", route = "/") {
                 status: 500
             }
         };
+    } finally {
+        if (result) result.destroy();
+        if (pyHeaders) pyHeaders.destroy();
     }
 }
 
+// Normalize a request body posted from the preview iframe to bytes
+async function requestBodyBytes(body) {
+    if (body === null || body === undefined) return null;
+    if (typeof body === 'string') return new TextEncoder().encode(body);
+    if (body instanceof Blob) return new Uint8Array(await body.arrayBuffer());
+    if (body instanceof ArrayBuffer) return new Uint8Array(body);
+    if (ArrayBuffer.isView(body)) return new Uint8Array(body.buffer, body.byteOffset, body.byteLength);
+    return new TextEncoder().encode(String(body));
+}
+
 function logDate() {
     const logDateFormat = new Intl.DateTimeFormat('en-US', {
         day: '2-digit',
@@ -1558,27 +1588,27 @@ with open("templates/${filename}", "w") as file:
             `);
         }
 
-        // Set up start_response function - exact SippyCup approach
+        // Install the WSGI adapter that builds the environ and collects
+        // responses, and the opt-in profiler the example apps use
+        for (const moduleFile of ['codemate_wsgi.py', 'codemate_profiler.py']) {
+            const moduleSource = await (await fetch(moduleFile)).text();
+            pyodide.FS.writeFile(moduleFile, moduleSource);
+        }
         pyodide.runPython(`
-# Initialize global variables
-headers = {}
-requestStatus = '200 OK'
-
-def start_response(status, responseHeaders, exc_info=None):   
-    global requestStatus, headers
-    requestStatus = status
-    headersObject = {}
-    for key, value in responseHeaders:
-        headersObject[key] = value
-    headers = headersObject
+import os
+import sys
+if os.getcwd() not in sys.path:
+    sys.path.insert(0, os.getcwd())
+import codemate_wsgi
         `);
+        applyProfileToken();
 
         // Execute the Flask app code - exact SippyCup approach
         pyodide.runPython(appFile.content);
         
-        // Get the Flask app and start_response function
+        // Get the Flask app and the adapter's request handler
         flaskApp = pyodide.globals.get('app');
-        pyodideStartResponse = pyodide.globals.get('start_response');
+        pyodideHandleRequest = pyodide.pyimport('codemate_wsgi').handle_request;
         
         // Set up simple preview like SippyCup
         setupSimpleFlaskPreview();
@@ -1637,7 +1667,9 @@ function setupSimpleFlaskPreview() {
                             type: 'flask-request',
                             requestId: requestId,
                             path: url,
-                            method: options.method || 'GET'
+                            method: options.method || 'GET',
+                            data: options.body || null,
+                            headers: Object.fromEntries(new Headers(options.headers || {}))
                         }, '*');
                         
                         // Timeout after 5 seconds
@@ -1661,10 +1693,11 @@ function setupSimpleFlaskPreview() {
     window.addEventListener('message', async (event) => {
         if (event.data.type === 'flask-request') {
             try {
-                const { path, method, requestId } = event.data;
+                const { path, method, requestId, data, headers } = event.data;
                 console.log('Handling Flask request:', method, path);
                 
-                const response = handleRequest(method || 'GET', path || '/');
+                const body = await requestBodyBytes(data);
+                const response = handleRequest(method || 'GET', path || '/', body, headers || {});
                 const responseData = new TextDecoder().decode(response.value.body);
                 
                 console.log('Flask response data:', responseData);
@@ -1772,7 +1805,7 @@ function generateFlaskPreviewHTML() {
                             path,
                             method: options.method || 'GET',
                             data: options.body || null,
-                            headers: options.headers || {}
+                            headers: Object.fromEntries(new Headers(options.headers || {}))
                         }, '*');
                         
                         // Set timeout
@@ -1820,8 +1853,9 @@ async function handleFlaskRequestFromIframe(path, method = 'GET', data = null, h
     }
     
     try {
-        // Use Sippy-Cup style request handling
-        const response = handleRequest(method, path);
+        // Route through the WSGI adapter, forwarding the body and headers
+        const body = await requestBodyBytes(data);
+        const response = handleRequest(method, path, body, headers);
         
         // Convert response to expected format - use exact Sippy-Cup approach
         const responseData = new TextDecoder().decode(response.value.body).trim();
@@ -2252,6 +2286,8 @@ function showTerminalHelp() {
     addToTerminal('  pip install <package>    Install Python package', 'log');
     addToTerminal('  pip list                 List Python packages', 'log');
     addToTerminal('  pip help                 Show pip help', 'log');
+    addToTerminal('  profile token <token>    Enable request profiling', 'log');
+    addToTerminal('  profile off              Disable request profiling', 'log');
     addToTerminal('', 'log');
     addToTerminal('Node.js & npm (Simulated):', 'info');
     addToTerminal('  npm install <package>    Simulate npm package install', 'log');
@@ -2440,6 +2476,12 @@ document.addEventListener('DOMContentLoaded', function() {
                         listNpmPackages();
                     } else if (command.startsWith('db ')) {
                         await handleDatabaseCommand(command);
+                    } else if (command.startsWith('profile token ')) {
+                        setProfileToken(command.substring(14).trim());
+                        addToTerminal('Profiling enabled for requests carrying this token', 'info');
+                    } else if (command === 'profile off') {
+                        setProfileToken(null);
+                        addToTerminal('Profiling disabled', 'info');
                     } else if (command === 'help' || command === '--help') {
                         showTerminalHelp();
                     } else {
@@ -2846,6 +2888,14 @@ class CodeMateDB {
     constructor(roomId) {
         this.roomId = roomId;
         this.db = gun.get('CodeMate').get(roomId).get('database');
+        // Live, sorted field indexes of the namespaces read so far, least
+        // recently used first, and bounded by an estimated size in bytes
+        this.hashIndexes = new Map();
+        this.hashIndexBytes = 0;
+        this.hashIndexMaxBytes = 1024 * 1024;
+        // Called with (namespace, field) whenever an indexed field changes,
+        // locally or on another peer, and with (namespace, null) on eviction
+        this.hashListeners = [];
         console.log('CodeMateDB initialized for room:', roomId);
     }
 
@@ -2939,6 +2989,195 @@ class CodeMateDB {
         return await this.set(key, newValue);
     }
 
+    // Namespaced hashes: each field is its own Gun node under the namespace,
+    // so reading or writing one field never loads or rewrites the others
+    _hashNode(namespace) {
+        return this.db.get(`hash:${namespace}`);
+    }
+
+    // Synchronous index of one namespace: its field names in sorted order and
+    // their values, kept live from Gun.js. Lets Python page through a hash
+    // without awaiting a Promise, and without re-listing it for every page.
+    _hashIndex(namespace) {
+        let index = this.hashIndexes.get(namespace);
+        if (index) {
+            // Most recently used last
+            this.hashIndexes.delete(namespace);
+            this.hashIndexes.set(namespace, index);
+            return index;
+        }
+        index = { fields: [], values: new Map(), sizes: new Map(), bytes: 0, ready: false };
+        this.hashIndexes.set(namespace, index);
+        index.chain = this._hashNode(namespace).map();
+        index.chain.on((data, field) => {
+            if (this.hashIndexes.get(namespace) === index) {
+                this._indexHashField(namespace, index, field, data && data.value !== undefined ? data.value : null);
+            }
+        });
+        // Gun.js replays the fields it holds right after subscribing; until
+        // then an empty index can't be told apart from an empty hash
+        setTimeout(() => { index.ready = true; }, 100);
+        return index;
+    }
+
+    _indexHashField(namespace, index, field, value) {
+        const position = CodeMateDB._bisectLeft(index.fields, field);
+        const present = index.fields[position] === field;
+        const oldSize = index.sizes.get(field) || 0;
+        let size = 0;
+        if (value === null || value === undefined) {
+            if (present) {
+                index.fields.splice(position, 1);
+                index.values.delete(field);
+                index.sizes.delete(field);
+            }
+        } else {
+            if (!present) {
+                index.fields.splice(position, 0, field);
+            }
+            index.values.set(field, value);
+            size = field.length + (JSON.stringify(value) || '').length;
+            index.sizes.set(field, size);
+        }
+        index.bytes += size - oldSize;
+        this.hashIndexBytes += size - oldSize;
+        this._notifyHashChange(namespace, field);
+        this._evictHashIndexes();
+    }
+
+    // Drop least recently used namespaces while over budget, always keeping
+    // the most recent one
+    _evictHashIndexes() {
+        while (this.hashIndexBytes > this.hashIndexMaxBytes && this.hashIndexes.size > 1) {
+            const [namespace, index] = this.hashIndexes.entries().next().value;
+            this.hashIndexes.delete(namespace);
+            this.hashIndexBytes -= index.bytes;
+            index.chain.off();
+            this._notifyHashChange(namespace, null);
+        }
+    }
+
+    onHashChange(listener) {
+        this.hashListeners.push(listener);
+    }
+
+    _notifyHashChange(namespace, field) {
+        for (const listener of this.hashListeners) {
+            try {
+                listener(namespace, field);
+            } catch (error) {
+                console.error('Hash change listener failed:', error);
+            }
+        }
+    }
+
+    // First position in a sorted array whose entry is not less than `field`
+    static _bisectLeft(fields, field) {
+        let low = 0;
+        let high = fields.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (fields[middle] < field) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+
+    async hset(namespace, field, value) {
+        return new Promise((resolve, reject) => {
+            try {
+                const data = {
+                    value: value,
+                    timestamp: Date.now(),
+                    type: typeof value
+                };
+                const index = this.hashIndexes.get(namespace);
+                if (index) {
+                    this._indexHashField(namespace, index, field, value);
+                }
+                this._hashNode(namespace).get(field).put(data, (ack) => {
+                    if (ack.err) {
+                        reject(new Error(ack.err));
+                    } else {
+                        resolve(value);
+                    }
+                });
+            } catch (error) {
+                reject(error);
+            }
+        });
+    }
+
+    async hget(namespace, field) {
+        return new Promise((resolve) => {
+            this._hashNode(namespace).get(field).once((data) => {
+                resolve(data && data.value !== undefined ? data.value : null);
+            });
+        });
+    }
+
+    async hdel(namespace, field) {
+        return new Promise((resolve, reject) => {
+            const index = this.hashIndexes.get(namespace);
+            if (index) {
+                this._indexHashField(namespace, index, field, null);
+            }
+            this._hashNode(namespace).get(field).put(null, (ack) => {
+                if (ack.err) {
+                    reject(new Error(ack.err));
+                } else {
+                    resolve(true);
+                }
+            });
+        });
+    }
+
+    // List the field names of a namespace without reading other namespaces
+    async hkeys(namespace) {
+        return new Promise((resolve) => {
+            const fields = [];
+            this._hashNode(namespace).map().once((data, field) => {
+                if (data && data.value !== undefined && field !== '_') {
+                    fields.push(field);
+                }
+            });
+            
+            // Give it a moment to collect all fields, like list()
+            setTimeout(() => resolve(fields), 100);
+        });
+    }
+
+    // One field of a namespace, synchronously, from its index. Returns
+    // [ready, value]; not ready means the namespace is still loading.
+    hgetSync(namespace, field) {
+        const index = this._hashIndex(namespace);
+        const value = index.values.get(field);
+        return [index.ready || value !== undefined, value === undefined ? null : value];
+    }
+
+    // One page of a namespace in field order, synchronously: at most `count`
+    // fields after `cursor`. Returns [nextCursor, Map of field to value,
+    // ready]; an empty nextCursor means the scan is done, and not ready means
+    // the namespace is still loading, so the page may be short or empty.
+    hscanSync(namespace, cursor, count) {
+        const index = this._hashIndex(namespace);
+        count = Math.max(1, count);
+        let start = 0;
+        if (cursor) {
+            start = CodeMateDB._bisectLeft(index.fields, cursor);
+            if (index.fields[start] === cursor) {
+                start += 1;
+            }
+        }
+        const fields = index.fields.slice(start, start + count);
+        const items = new Map(fields.map(field => [field, index.values.get(field)]));
+        const nextCursor = start + count < index.fields.length ? fields[fields.length - 1] : '';
+        return [nextCursor, items, index.ready];
+    }
+
     // Watch for changes to a key
     watch(key, callback) {
         this.db.get(key).on((data) => {
@@ -2966,6 +3205,10 @@ class CodeMateDB {
 
 // SQL Database functionality using SQL.js
 // SQL Database functionality using SQL.js
+
+// Extra time a budgeted query gets to stop itself before its worker is killed
+const SQL_BUDGET_GRACE_MS = 250;
+
 class CodeMateSQLDB {
     constructor(roomId) {
         this.roomId = roomId;
@@ -2974,6 +3217,8 @@ class CodeMateSQLDB {
         this.isReady = false;
         this.commandQueue = new Map();
         this.commandCounter = 0;
+        // Last exported database image, reopened if the worker has to be restarted
+        this.lastBuffer = null;
 
         // The promise that resolves when the database is fully initialized.
         this.initPromise = this.initialize(); 
@@ -2984,7 +3229,7 @@ class CodeMateSQLDB {
     async initialize() {
         return new Promise(async (resolve, reject) => {
             // Central handler for all messages from the worker
-            this.worker.onmessage = (event) => {
+            this.worker.onmessage = this._onWorkerMessage = (event) => {
                 const { id, error, results, ready, data } = event.data;
                 const pendingCommand = this.commandQueue.get(id);
 
@@ -3003,7 +3248,7 @@ class CodeMateSQLDB {
                 }
             };
             
-            this.worker.onerror = (e) => {
+            this.worker.onerror = this._onWorkerError = (e) => {
                 console.error("Error from SQL worker:", e);
                 // Reject any pending commands
                 this.commandQueue.forEach(cmd => cmd.reject(new Error(e.message)));
@@ -3013,6 +3258,7 @@ class CodeMateSQLDB {
 
             // 1. Load existing database from Gun.js first
             const dbData = await this.loadFromGun();
+            this.lastBuffer = dbData;
 
             // 2. Send the 'open' command to the worker with the loaded data (or null)
             const openResult = await this._sendCommand('open', { buffer: dbData });
@@ -3030,6 +3276,19 @@ class CodeMateSQLDB {
         });
     }
 
+    // Terminate a worker stuck inside a statement and reopen the last exported
+    // image in a fresh one. Pending commands fail, open cursors are lost, and
+    // changes made since the last export are discarded.
+    _restartWorker(reason) {
+        this.worker.terminate();
+        this.commandQueue.forEach(cmd => cmd.reject(new Error(reason)));
+        this.commandQueue.clear();
+        this.worker = new Worker('worker.sql-wasm.js');
+        this.worker.onmessage = this._onWorkerMessage;
+        this.worker.onerror = this._onWorkerError;
+        return this._sendCommand('open', { buffer: this.lastBuffer });
+    }
+
     // A private helper to send commands to the worker and get a promise back
     _sendCommand(action, payload = {}) {
         return new Promise((resolve, reject) => {
@@ -3065,9 +3324,23 @@ class CodeMateSQLDB {
         await this.waitForReady();
         const results = await this._sendCommand('exec', { sql });
         // After any modification, export the DB and save it
+        await this.persist();
+        return results;
+    }
+
+    // Run a write without exporting, for bulk loads; call persist() once after
+    // the batch instead of serializing the whole database per statement
+    async execNoPersist(sql) {
+        await this.waitForReady();
+        return this._sendCommand('exec', { sql });
+    }
+
+    // Export the database, keep the image for worker restarts and save it to Gun.js
+    async persist() {
         const dbData = await this._sendCommand('export');
+        this.lastBuffer = dbData;
         await this.saveToGun(dbData);
-        return results;
+        return true;
     }
 
     // For running SELECT queries
@@ -3077,6 +3350,56 @@ class CodeMateSQLDB {
         return this._sendCommand('exec', { sql });
     }
 
+    // For ad-hoc console queries: the worker stops stepping once the time
+    // budget is spent and returns at most maxRows rows per statement
+    async queryWithBudget(sql, timeoutMs, maxRows) {
+        await this.waitForReady();
+        return this._withBudget(this._sendCommand('execBudget', { sql, timeoutMs, maxRows }), timeoutMs);
+    }
+
+    // The worker checks its deadline between rows only, so a single long step
+    // (a cross join under COUNT(*), ORDER BY or GROUP BY) never sees it. Once
+    // the budget and a grace period are spent, kill and restart the worker.
+    async _withBudget(command, timeoutMs) {
+        if (!timeoutMs) {
+            return command;
+        }
+        let timer;
+        let timedOut = false;
+        const deadline = new Promise((resolve, reject) => {
+            timer = setTimeout(() => {
+                timedOut = true;
+                reject(new Error(`interrupted: query exceeded its ${timeoutMs} ms budget`));
+            }, timeoutMs + SQL_BUDGET_GRACE_MS);
+        });
+        try {
+            return await Promise.race([command, deadline]);
+        } catch (error) {
+            if (timedOut) {
+                await this._restartWorker(error.message);
+            }
+            throw error;
+        } finally {
+            clearTimeout(timer);
+        }
+    }
+
+    // Server-side cursors for paging through large results
+    async openCursor(sql) {
+        await this.waitForReady();
+        return this._sendCommand('cursorOpen', { sql });
+    }
+
+    async fetchCursor(cursorId, n, timeoutMs) {
+        await this.waitForReady();
+        return this._withBudget(this._sendCommand('cursorFetch', { cursorId, n, timeoutMs }), timeoutMs);
+    }
+
+    async closeCursor(cursorId) {
+        await this.waitForReady();
+        return this._sendCommand('cursorClose', { cursorId });
+    }
+
     async getTables() {
         await this.waitForReady();
         const results = await this.query("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';");
@@ -3129,6 +3452,7 @@ class CodeMateSQLDB {
         gun.get('CodeMate').get(this.roomId).get('sqlDatabase').on(async (data) => {
             if (data && typeof data === 'string') {
                 const currentDataExport = await this._sendCommand('export');
+                this.lastBuffer = currentDataExport;
                 const currentBase64 = currentDataExport ? btoa(String.fromCharCode.apply(null, currentDataExport)) : null;
 
                 if (data !== currentBase64) {
@@ -3146,6 +3470,7 @@ class CodeMateSQLDB {
             
             // Send the 'open' command with the new data buffer
             await this._sendCommand('open', { buffer: bytes });
+            this.lastBuffer = bytes;
             console.log('SQL Database reloaded from Gun.js sync');
             
             // Refresh UI if the database panel is active
@@ -3171,8 +3496,7 @@ class CodeMateSQLDB {
         await this._sendCommand('exec', { sql, params: { ':key': key, ':value': valueStr, ':type': type } });
 
         // Save to Gun.js after successful modification
-        const dbData = await this._sendCommand('export');
-        await this.saveToGun(dbData);
+        await this.persist();
         return value;
     }
 
@@ -3186,6 +3510,11 @@ class CodeMateSQLDB {
         }
 
         const [value, type] = results[0].values[0];
+        return CodeMateSQLDB.decodeValue(value, type);
+    }
+
+    // Turn a stored kv_store value back into its original type
+    static decodeValue(value, type) {
         if (type === 'object') {
             try { return JSON.parse(value); } catch (e) { return value; }
         } else if (type === 'number') {
@@ -3201,8 +3530,7 @@ class CodeMateSQLDB {
         const sql = "DELETE FROM kv_store WHERE key = :key";
         await this._sendCommand('exec', { sql, params: { ':key': key } });
         
-        const dbData = await this._sendCommand('export');
-        await this.saveToGun(dbData);
+        await this.persist();
         return true;
     }
 
@@ -3213,16 +3541,19 @@ class CodeMateSQLDB {
         
         if (results && results.length > 0 && results[0].values) {
             results[0].values.forEach(([key, value, type, timestamp]) => {
-                let parsedValue = value;
-                if (type === 'object') {
-                    try { parsedValue = JSON.parse(value); } catch (e) {}
-                } else if (type === 'number') {
-                    parsedValue = parseFloat(value);
-                } else if (type === 'boolean') {
-                    parsedValue = value === 'true';
-                }
-                
-                data[key] = { value: parsedValue, type, timestamp: new Date(timestamp).getTime() };
+                // Values are decoded on first access, so listing many large
+                // JSON entries doesn't parse the ones nobody reads
+                const item = { type, timestamp: new Date(timestamp).getTime() };
+                Object.defineProperty(item, 'value', {
+                    enumerable: true,
+                    configurable: true,
+                    get() {
+                        const decoded = CodeMateSQLDB.decodeValue(value, type);
+                        Object.defineProperty(item, 'value', { value: decoded, enumerable: true, writable: true });
+                        return decoded;
+                    }
+                });
+                data[key] = item;
             });
         }
         return data;
@@ -3327,55 +3658,23 @@ async function switchDatabaseType(type) {
 }
 
 // Python database integration
-function setupPythonDatabase() {
+async function setupPythonDatabase() {
     if (!pyodide || !db) return;
     
     try {
+        // The wrapper lives in codemate_db.py, installed like the WSGI adapter
+        const moduleSource = await (await fetch('codemate_db.py')).text();
+        pyodide.FS.writeFile('codemate_db.py', moduleSource);
         pyodide.runPython(`
-import js
-import json
-from pyodide.ffi import to_js, create_proxy
-
-class Database:
-    def __init__(self):
-        self.js_db = js.db
-    
-    def set(self, key, value):
-        """Set a key-value pair in the database"""
-        return self.js_db.set(key, value)
-    
-    def get(self, key):
-        """Get a value by key from the database"""
-        return self.js_db.get(key)
-    
-    def delete(self, key):
-        """Delete a key from the database"""
-        return self.js_db.delete(key)
-    
-    def list(self):
-        """List all data in the database"""
-        return self.js_db.list()
-    
-    def push(self, array_key, value):
-        """Add to array"""
-        return self.js_db.push(array_key, value)
-    
-    def increment(self, key, amount=1):
-        """Increment a numeric value"""
-        return self.js_db.increment(key, amount)
-    
-    def watch(self, key, callback):
-        """Watch for changes to a key"""
-        js_callback = create_proxy(callback)
-        return self.js_db.watch(key, js_callback)
-    
-    def query(self, filter_func):
-        """Simple query with filter function"""
-        js_filter = create_proxy(filter_func)
-        return self.js_db.query(js_filter)
+import os
+import sys
+if os.getcwd() not in sys.path:
+    sys.path.insert(0, os.getcwd())
+from codemate_db import Database, HashIndexLoading
 
-# Make database available in Python
-db = Database()
+# Make database available in Python, once: each instance listens to js.db
+if not isinstance(globals().get('db'), Database):
+    db = Database()
         `);
         console.log('Python database integration ready');
         addToConsole('Python database ready! Use db.set(), db.get(), db.list() in Python', 'info');
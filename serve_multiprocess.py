@@ -0,0 +1,350 @@
+# Multi-process serving mode for flask_sql_example.py
+# Runs the example outside the browser under a pre-fork WSGI server: N worker
+# processes accept from one shared socket, each with its own pool of sqlite3
+# connections to a shared WAL-mode database file.
+#
+#     python serve_multiprocess.py --workers 4 --db codemate.db
+#     python serve_multiprocess.py --bench --workers 4     # load test 1..4 workers
+#
+# Query cursors (/api/query with "cursor": true) live in the worker that
+# opened them. A page request that another worker accepts gets a 404, so page
+# through cursors with --workers 1. Likewise, each worker keeps its own
+# request profiles, and /api/debug/profile aggregates one worker's only.
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import codemate_profiler
+import fake_js
+
+# GET routes whose responses are cached per worker until the database changes
+CACHED_PATHS = ('/api/users', '/api/posts', '/api/users/top', '/api/stats')
+CACHE_MAX_ENTRIES = 256
+
+class PooledSQLDatabase:
+    """js.sqlDb backed by a pool of sqlite3 connections to one WAL database.
+
+    Every write bumps a version counter stored in the database itself, so all
+    worker processes can tell when their cached responses went stale.
+    """
+    def __init__(self, path, size=4):
+        self.path = path
+        self.pool = queue.Queue()
+        for _ in range(size):
+            self.pool.put(self._connect())
+        self.cursors = {}
+        self.next_cursor_id = 1
+        self.lock = threading.Lock()
+        self.isReady = True
+
+    def _connect(self):
+        db = fake_js.SQLDatabase(self.path)
+        db.connection.execute('PRAGMA busy_timeout = 5000')
+        db.connection.execute('PRAGMA journal_mode = WAL')
+        db.connection.execute('PRAGMA synchronous = NORMAL')
+        return db
+
+    def _call(self, name, *args):
+        db = self.pool.get(timeout=30)
+        try:
+            # DDL doesn't count towards total_changes but does bump the schema
+            before = (db.connection.total_changes, self._schema_version(db))
+            result = getattr(db, name)(*args)
+            if (db.connection.total_changes, self._schema_version(db)) != before:
+                db.connection.execute('UPDATE cache_version SET version = version + 1')
+            return result
+        finally:
+            self.pool.put(db)
+
+    @staticmethod
+    def _schema_version(db):
+        return db.connection.execute('PRAGMA schema_version').fetchone()[0]
+
+    def version(self):
+        """Current cross-process data version"""
+        return self._call('query', 'SELECT version FROM cache_version')[0].values[0][0]
+
+    def exec(self, sql, params=None):
+        return self._call('exec', sql, params)
+
+    def execNoPersist(self, sql, params=None):
+        return self._call('exec', sql, params)
+
+    def persist(self):
+        # Every commit is already durable in the WAL file
+        return True
+
+    def query(self, sql, params=None):
+        return self._call('query', sql, params)
+
+    def queryWithBudget(self, sql, timeoutMs, maxRows):
+        return self._call('queryWithBudget', sql, timeoutMs, maxRows)
+
+    def getTables(self):
+        return self._call('getTables')
+
+    def set(self, key, value):
+        return self._call('set', key, value)
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def delete(self, key):
+        return self._call('delete', key)
+
+    def list(self):
+        return self._call('list')
+
+    # Each cursor reads through its own connection, opened with it and closed
+    # with it, so unread cursors never starve the pool the other routes use
+    def openCursor(self, sql):
+        db = self._connect()
+        try:
+            opened = db.openCursor(sql)
+        except Exception:
+            db.connection.close()
+            raise
+        with self.lock:
+            cursor_id = self.next_cursor_id
+            self.next_cursor_id += 1
+            self.cursors[cursor_id] = (db, opened.cursorId)
+        return fake_js.OpenedCursor(cursor_id, opened.columns)
+
+    def fetchCursor(self, cursorId, n, timeoutMs=0):
+        with self.lock:
+            entry = self.cursors.get(cursorId)
+        if entry is None:
+            raise ValueError(f'Unknown cursor: {cursorId}')
+        db, inner_id = entry
+        try:
+            page = db.fetchCursor(inner_id, n, timeoutMs)
+        except Exception:
+            # An interrupted cursor is gone; release its connection
+            self.closeCursor(cursorId)
+            raise
+        if page.done:
+            self.closeCursor(cursorId)
+        return page
+
+    def closeCursor(self, cursorId):
+        with self.lock:
+            entry = self.cursors.pop(cursorId, None)
+        if entry:
+            db, inner_id = entry
+            db.closeCursor(inner_id)
+            db.connection.close()
+        return True
+
+class ResponseCache:
+    """WSGI middleware caching GET listings until the data version changes"""
+    def __init__(self, app, sql_db):
+        self.app = app
+        self.sql_db = sql_db
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] != 'GET' or environ.get('PATH_INFO') not in CACHED_PATHS:
+            return self.app(environ, start_response)
+        # Profiled requests must really run, and their output must not be cached
+        if codemate_profiler.PROFILE_HEADER in environ or codemate_profiler.PROFILE_QUERY_FLAG in environ.get('QUERY_STRING', ''):
+            return self.app(environ, start_response)
+
+        key = (environ['PATH_INFO'], environ.get('QUERY_STRING', ''))
+        version = self.sql_db.version()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == version:
+                self.entries.move_to_end(key)
+                start_response(entry[1], entry[2])
+                return [entry[3]]
+
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            return start_response(status, headers, exc_info)
+
+        result = self.app(environ, capture)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        if captured.get('status', '').startswith('200'):
+            with self.lock:
+                self.entries[key] = (version, captured['status'], captured['headers'], body)
+                self.entries.move_to_end(key)
+                while len(self.entries) > CACHE_MAX_ENTRIES:
+                    self.entries.popitem(last=False)
+        return [body]
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def _install_js(db_path, pool_size):
+    """Register a js module whose sqlDb is a connection pool on db_path"""
+    module = types.ModuleType('js')
+    module.sqlDb = PooledSQLDatabase(db_path, pool_size)
+    module.db = fake_js.KVDatabase()
+    sys.modules['js'] = module
+    return module
+
+def _prepare_database(db_path):
+    """Create the schema once, before any worker starts"""
+    js = _install_js(db_path, 1)
+    js.sqlDb.exec('''
+        CREATE TABLE IF NOT EXISTS cache_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO cache_version (id, version) VALUES (1, 0);
+    ''')
+    import flask_sql_example
+    response = flask_sql_example.app.test_client().post('/api/init-db')
+    if response.status_code != 200:
+        raise RuntimeError(f'Database initialization failed: {response.get_data(as_text=True)}')
+
+def _worker(listener, db_path, pool_size, quiet):
+    """Serve requests from the shared listening socket until terminated"""
+    signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+    js = _install_js(db_path, pool_size)
+    import flask_sql_example
+    app = ResponseCache(flask_sql_example.app, js.sqlDb)
+
+    server = _ThreadingWSGIServer(listener.getsockname(), _QuietHandler if quiet else WSGIRequestHandler,
+                                  bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+    server.server_name, server.server_port = listener.getsockname()[:2]
+    server.setup_environ()
+    server.set_app(app)
+    server.serve_forever()
+
+def serve(host='127.0.0.1', port=5000, workers=2, db_path='codemate.db', pool_size=4, quiet=False, ready=None):
+    """Pre-fork `workers` processes serving flask_sql_example on host:port"""
+    _prepare_database(db_path)
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _worker(listener, db_path, pool_size, quiet)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(*args):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, lambda *args: (stop(), os._exit(0)))
+    if ready is not None:
+        ready.put(listener.getsockname()[1])
+    print(f'Serving flask_sql_example on http://{host}:{listener.getsockname()[1]} with {workers} worker(s)')
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        stop()
+
+def _bench_client(port, duration, results):
+    """Issue a read-heavy request mix until `duration` elapses"""
+    paths = ['/api/posts', '/api/users', '/api/users/top?limit=10', '/api/stats']
+    done = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        if done % 20 == 19:
+            body = json.dumps({'title': 'bench', 'content': 'load test', 'user_id': 1})
+            connection.request('POST', '/api/posts', body, {'Content-Type': 'application/json'})
+        else:
+            connection.request('GET', paths[done % len(paths)])
+        connection.getresponse().read()
+        connection.close()
+        done += 1
+    results.put(done)
+
+def bench(max_workers, duration=5.0, clients=None):
+    """Measure requests/second for 1..max_workers worker processes"""
+    clients = clients or max(4, 2 * max_workers)
+    context = multiprocessing.get_context('fork')
+    for workers in sorted({1, *range(2, max_workers + 1, 2), max_workers}):
+        db_path = f'bench_{os.getpid()}_{workers}.db'
+        ready = context.Queue()
+        server = context.Process(target=serve, kwargs=dict(port=0, workers=workers, db_path=db_path,
+                                                           quiet=True, ready=ready))
+        server.start()
+        port = ready.get(timeout=30)
+
+        # Seed a few users and posts so the listings have work to do
+        seed = http.client.HTTPConnection('127.0.0.1', port)
+        for i in range(20):
+            seed.request('POST', '/api/users', json.dumps({'name': f'user{i}', 'email': f'user{i}@example.com'}),
+                         {'Content-Type': 'application/json'})
+            seed.getresponse().read()
+            seed.close()
+        for i in range(200):
+            seed.request('POST', '/api/posts', json.dumps({'title': f'post{i}', 'content': 'x' * 200,
+                                                           'user_id': i % 20 + 1}),
+                         {'Content-Type': 'application/json'})
+            seed.getresponse().read()
+            seed.close()
+
+        results = context.Queue()
+        procs = [context.Process(target=_bench_client, args=(port, duration, results)) for _ in range(clients)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        total = sum(results.get() for _ in procs)
+        print(f'{workers} worker(s): {total / duration:,.0f} req/s ({clients} clients, {duration:.0f}s)')
+
+        server.terminate()
+        server.join()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve flask_sql_example with multiple worker processes')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--db', default='codemate.db', help='shared SQLite database file')
+    parser.add_argument('--pool-size', type=int, default=4, help='sqlite3 connections per worker')
+    parser.add_argument('--bench', action='store_true', help='load test 1..--workers workers and exit')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per load test run')
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.workers, args.duration)
+    else:
+        serve(args.host, args.port, args.workers, args.db, args.pool_size)
@@ -1,67 +1,586 @@
 # Test SQL Database in CodeMate
-# Run this to verify SQL database is working
-
-print("🧪 Testing SQL Database in CodeMate...")
-
-# Check if SQL database is available
-try:
-    import js
-    print("✓ js module imported successfully")
-    
-    if hasattr(js, 'sqlDb') and js.sqlDb:
-        print("✓ sqlDb is available")
-        
-        if js.sqlDb.isReady:
-            print("✓ SQL database is ready")
-            
-            # Test basic operations
-            print("\n📝 Testing basic SQL operations...")
-            
-            # Create a test table
-            js.sqlDb.exec('''
-                CREATE TABLE IF NOT EXISTS test_table (
-                    id INTEGER PRIMARY KEY,
-                    name TEXT,
-                    value INTEGER
-                )
-            ''')
-            print("✓ Test table created")
-            
-            # Insert test data
-            js.sqlDb.exec("INSERT OR REPLACE INTO test_table (id, name, value) VALUES (1, 'test_item', 42)")
-            print("✓ Test data inserted")
-            
-            # Query test data
-            results = js.sqlDb.query("SELECT * FROM test_table WHERE id = 1")
-            if results and len(results) > 0 and results[0].values:
-                row = results[0].values[0]
-                print(f"✓ Test data retrieved: id={row[0]}, name={row[1]}, value={row[2]}")
-            else:
-                print("❌ Failed to retrieve test data")
-            
-            # Test NoSQL-style methods
-            print("\n🗄️ Testing NoSQL-style methods...")
-            js.sqlDb.set('test_key', 'test_value')
-            value = js.sqlDb.get('test_key')
-            print(f"✓ NoSQL set/get test: {value}")
-            
-            print("\n✅ All SQL database tests passed!")
-            
-        else:
-            print("❌ SQL database is not ready")
-            print("   Try switching to SQL in the Database panel first")
-            
-    else:
-        print("❌ sqlDb is not available")
-        print("   Make sure you've switched to SQL database in the Database panel")
-        
-except Exception as e:
-    print(f"❌ Error testing SQL database: {e}")
-    import traceback
-    print(traceback.format_exc())
-
-print("\n💡 To use SQL database:")
-print("1. Switch to 'SQL' in the Database panel")
-print("2. Wait for 'SQL database ready!' message")
-print("3. Run this test again")
-print("4. Then try the Flask example")
+# Runs offline against fake_js (stdlib sqlite3), so correctness and throughput
+# regressions in the Flask examples show up on any machine:
+#
+#     python -m pytest -q -s test_sql_db.py     # or: python test_sql_db.py
+
+import contextlib
+import json
+import os
+import time
+
+import pytest
+
+import codemate_wsgi
+import fake_js
+
+BULK_ROWS = 10_000
+# Generous wall-clock ceilings for the bulk paths; they catch order-of-magnitude
+# regressions (a per-row round trip, a quadratic loop) rather than noise
+BULK_BUDGET_SECONDS = 10.0
+
+TIMINGS = {}
+
+@contextlib.contextmanager
+def timed(label, rows=None):
+    """Time a section, record it in TIMINGS and print the throughput"""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    TIMINGS[label] = elapsed
+    rate = f' ({rows / elapsed:,.0f} rows/s)' if rows and elapsed else ''
+    print(f'⏱ {label}: {elapsed * 1000:.1f} ms{rate}')
+
+@pytest.fixture
+def js():
+    return fake_js.install()
+
+@pytest.fixture
+def client(js):
+    flask_sql_example = pytest.importorskip('flask_sql_example')
+    client = flask_sql_example.app.test_client()
+    assert client.post('/api/init-db').get_json()['success']
+    return client
+
+def test_sql_db_ready(js):
+    assert js.sqlDb is not None
+    assert js.sqlDb.isReady
+
+def test_basic_sql_operations(js):
+    js.sqlDb.exec('''
+        CREATE TABLE IF NOT EXISTS test_table (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            value INTEGER
+        )
+    ''')
+    js.sqlDb.exec("INSERT OR REPLACE INTO test_table (id, name, value) VALUES (1, 'test_item', 42)")
+
+    results = js.sqlDb.query('SELECT * FROM test_table WHERE id = 1')
+    assert len(results) == 1
+    assert results[0].columns == ['id', 'name', 'value']
+    assert results[0].values == [[1, 'test_item', 42]]
+    assert 'test_table' in js.sqlDb.getTables()
+
+def test_multi_statement_exec_returns_each_result(js):
+    results = js.sqlDb.exec('''
+        CREATE TABLE t (x INTEGER);
+        CREATE TRIGGER t_insert AFTER INSERT ON t BEGIN SELECT 1; END;
+        INSERT INTO t VALUES (1); INSERT INTO t VALUES (2);
+        SELECT COUNT(*) AS n FROM t;
+        SELECT MAX(x) AS m FROM t;
+    ''')
+    assert [(r.columns, r.values) for r in results] == [(['n'], [[2]]), (['m'], [[2]])]
+
+def test_nosql_style_methods(js):
+    js.sqlDb.set('test_key', 'test_value')
+    js.sqlDb.set('count', 3)
+    js.sqlDb.set('flag', True)
+    js.sqlDb.set('config', {'theme': 'dark', 'tabs': [1, 2]})
+
+    assert js.sqlDb.get('test_key') == 'test_value'
+    assert js.sqlDb.get('count') == 3
+    assert js.sqlDb.get('flag') is True
+    assert js.sqlDb.get('config') == {'theme': 'dark', 'tabs': [1, 2]}
+    assert set(js.sqlDb.list()) == {'test_key', 'count', 'flag', 'config'}
+
+    js.sqlDb.delete('test_key')
+    assert js.sqlDb.get('test_key') is None
+
+def test_query_budget(js):
+    js.sqlDb.exec('CREATE TABLE n (x INTEGER)')
+    js.sqlDb.exec('INSERT INTO n SELECT value FROM (WITH RECURSIVE c(value) AS '
+                  '(SELECT 1 UNION ALL SELECT value + 1 FROM c WHERE value < 1000) SELECT value FROM c)')
+
+    results = js.sqlDb.queryWithBudget('SELECT x FROM n', 1000, 10)
+    assert len(results[0].values) == 10
+    assert results[0].truncated
+
+    with pytest.raises(Exception, match='interrupted'):
+        js.sqlDb.queryWithBudget('SELECT COUNT(*) FROM n a, n b, n c', 50, 10)
+
+def test_users_and_posts_crud(client):
+    response = client.post('/api/users', json={'name': "Ann O'Neil", 'email': 'ann@example.com'})
+    assert response.get_json()['success']
+    client.post('/api/users', json={'name': 'Bob', 'email': 'bob@example.com'})
+    assert client.post('/api/users', json={'name': 'Bob', 'email': 'bob@example.com'}).status_code == 400
+
+    users = client.get('/api/users').get_json()
+    assert sorted(user['name'] for user in users) == ["Ann O'Neil", 'Bob']
+
+    ann = next(user for user in users if user['name'] == "Ann O'Neil")
+    for title in ('First', 'Second'):
+        response = client.post('/api/posts', json={'title': title, 'content': 'Hello', 'user_id': ann['id']})
+        assert response.get_json()['success']
+
+    posts = client.get('/api/posts').get_json()
+    assert [post['title'] for post in posts] == ['Second', 'First']
+    assert all(post['author_name'] == "Ann O'Neil" for post in posts)
+
+    top = client.get('/api/users/top?limit=1').get_json()
+    assert [(user['name'], user['post_count']) for user in top] == [("Ann O'Neil", 2)]
+
+    stats = client.get('/api/stats').get_json()
+    assert (stats['user_count'], stats['post_count']) == (2, 2)
+
+def test_delta_fetch(client, js):
+    client.post('/api/users', json={'name': 'Ann', 'email': 'ann@example.com'})
+    client.post('/api/users', json={'name': 'Bob', 'email': 'bob@example.com'})
+    js.sqlDb.exec("UPDATE users SET updated_at = '2000-01-01 00:00:00'")
+    first = client.get('/api/users?since=1').get_json()
+    assert [user['name'] for user in first['rows']] == ['Bob']
+
+    # The rowid cursor hands back a timestamp, so edits and deletes follow
+    js.sqlDb.exec("UPDATE users SET email = 'ann@example.org' WHERE name = 'Ann'")
+    js.sqlDb.exec("DELETE FROM users WHERE name = 'Bob'")
+    delta = client.get(f"/api/users?since={first['since']}").get_json()
+    assert [user['email'] for user in delta['rows']] == ['ann@example.org']
+    assert delta['deleted'] == [first['rows'][0]['id']]
+
+    # ISO 8601 input is normalized before comparing; junk is rejected
+    today = first['since'][:10]
+    assert len(client.get(f'/api/users?since={today}T00:00:00Z').get_json()['rows']) == 1
+    assert len(client.get(f'/api/users?since={today}T01:00:00%2B01:00').get_json()['rows']) == 1
+    assert client.get('/api/users?since=yesterday').status_code == 400
+    assert client.get('/api/posts?since=2026-13-01').status_code == 400
+
+def test_feed_backfill_runs_once(client, js):
+    client.post('/api/users', json={'name': 'Ann', 'email': 'ann@example.com'})
+    client.post('/api/posts', json={'title': 'Hello', 'content': 'World', 'user_id': 1})
+
+    # Rows the triggers didn't put there stay out: init-db no longer re-joins
+    js.sqlDb.exec('DELETE FROM posts_feed')
+    assert client.post('/api/init-db').get_json()['success']
+    assert client.get('/api/posts').get_json() == []
+
+    # A database from before the feed existed gets it backfilled
+    triggers = js.sqlDb.query("SELECT name FROM sqlite_master WHERE name LIKE 'posts_feed_%' AND type = 'trigger'")
+    js.sqlDb.exec(''.join(f'DROP TRIGGER {row[0]};' for row in triggers[0].values) + 'DROP TABLE posts_feed;')
+    assert client.post('/api/init-db').get_json()['success']
+    assert [post['title'] for post in client.get('/api/posts').get_json()] == ['Hello']
+
+def test_post_edit_reaches_feed_delta_after_repeated_init(client, js):
+    # The page calls init-db on every load
+    assert client.post('/api/init-db').get_json()['success']
+    client.post('/api/users', json={'name': 'Ann', 'email': 'ann@example.com'})
+    client.post('/api/posts', json={'title': 'T1', 'content': 'Body', 'user_id': 1})
+    js.sqlDb.exec("UPDATE posts SET updated_at = '2000-01-01 00:00:00'")
+
+    js.sqlDb.exec("UPDATE posts SET title = 'T2'")
+    assert [post['title'] for post in client.get('/api/posts?since=2001-01-01').get_json()['rows']] == ['T2']
+
+def test_post_count_does_not_touch_author(client, js):
+    client.post('/api/users', json={'name': 'Ann', 'email': 'ann@example.com'})
+    js.sqlDb.exec("UPDATE users SET updated_at = '2000-01-01 00:00:00'")
+    client.post('/api/posts', json={'title': 'Hello', 'content': 'World', 'user_id': 1})
+
+    assert client.get('/api/users/top').get_json()[0]['post_count'] == 1
+    assert client.get('/api/users?since=2001-01-01').get_json()['rows'] == []
+
+    js.sqlDb.exec("UPDATE users SET email = 'ann@example.org'")
+    assert [user['email'] for user in client.get('/api/users?since=2001-01-01').get_json()['rows']] == ['ann@example.org']
+
+def test_console_query_and_cursor(client):
+    for i in range(5):
+        client.post('/api/users', json={'name': f'user{i}', 'email': f'user{i}@example.com'})
+
+    result = client.post('/api/query', json={'query': 'SELECT name FROM users ORDER BY id'}).get_json()
+    assert result['columns'] == ['name']
+    assert len(result['data']) == 5 and not result['truncated']
+
+    page = client.post('/api/query', json={'query': 'SELECT id FROM users ORDER BY id', 'cursor': True,
+                                           'page_size': 2}).get_json()
+    seen = [row[0] for row in page['data']]
+    while page['cursor_id']:
+        page = client.get(f"/api/query/cursor/{page['cursor_id']}?n=2").get_json()
+        seen += [row[0] for row in page['data']]
+    assert seen == [1, 2, 3, 4, 5]
+
+def test_cursor_dies_on_write(client, js):
+    for i in range(5):
+        client.post('/api/users', json={'name': f'user{i}', 'email': f'user{i}@example.com'})
+    page = client.post('/api/query', json={'query': 'SELECT id FROM users', 'cursor': True,
+                                           'page_size': 2}).get_json()
+
+    # Every write exports the database, which frees the worker's statements
+    js.sqlDb.set('touched', True)
+    response = client.get(f"/api/query/cursor/{page['cursor_id']}")
+    assert response.status_code == 404
+
+    import flask_sql_example
+    assert page['cursor_id'] not in flask_sql_example._cursors
+
+def test_export_survives_writes_mid_stream(client, js, monkeypatch):
+    import flask_sql_example
+    monkeypatch.setattr(flask_sql_example, 'EXPORT_CHUNK_ROWS', 2)
+    for i in range(5):
+        client.post('/api/users', json={'name': f'user{i}', 'email': f'user{i}@example.com'})
+
+    response = client.get('/api/export/users?format=ndjson', buffered=False)
+    chunks = iter(response.response)
+    exported = next(chunks)
+    js.sqlDb.exec("INSERT INTO users (name, email) VALUES ('late', 'late@example.com')")
+    exported += b''.join(chunks)
+    names = [json.loads(line)['name'] for line in exported.decode().splitlines()]
+    assert names == [f'user{i}' for i in range(5)] + ['late']
+
+def test_budget_overrun_restarts_worker(client, js):
+    js.sqlDb.exec('CREATE TABLE n (x INTEGER)')
+    js.sqlDb.exec('INSERT INTO n SELECT value FROM (WITH RECURSIVE c(value) AS '
+                  '(SELECT 1 UNION ALL SELECT value + 1 FROM c WHERE value < 1000) SELECT value FROM c)')
+    page = client.post('/api/query', json={'query': 'SELECT x FROM n', 'cursor': True,
+                                           'page_size': 2}).get_json()
+
+    # All the work happens inside a single step, and the query is still stopped
+    import flask_sql_example
+    started = time.perf_counter()
+    response = client.post('/api/query', json={'query': 'SELECT COUNT(*) FROM n a, n b, n c'})
+    assert response.status_code == 408
+    assert time.perf_counter() - started < flask_sql_example.QUERY_TIMEOUT_MS / 1000 + 1
+
+    # Restarting the worker loses its cursors
+    assert client.get(f"/api/query/cursor/{page['cursor_id']}").status_code == 404
+
+def test_cursor_fetch_is_held_to_the_budget(client, js, monkeypatch):
+    import flask_sql_example
+    monkeypatch.setattr(flask_sql_example, 'QUERY_TIMEOUT_MS', 200)
+    js.sqlDb.exec('CREATE TABLE n (x INTEGER)')
+    js.sqlDb.exec('INSERT INTO n SELECT value FROM (WITH RECURSIVE c(value) AS '
+                  '(SELECT 1 UNION ALL SELECT value + 1 FROM c WHERE value < 1000) SELECT value FROM c)')
+
+    started = time.perf_counter()
+    response = client.post('/api/query', json={'query': 'SELECT COUNT(*) FROM n a, n b, n c',
+                                               'cursor': True})
+    assert response.status_code == 408
+    assert time.perf_counter() - started < 2
+
+    # Ordinary cursors still page as before
+    page = client.post('/api/query', json={'query': 'SELECT x FROM n', 'cursor': True,
+                                           'page_size': 5}).get_json()
+    assert page['columns'] == ['x'] and len(page['data']) == 5
+
+def test_bulk_sql_insert_and_scan(js):
+    js.sqlDb.exec('CREATE TABLE bulk (id INTEGER PRIMARY KEY, name TEXT, value INTEGER)')
+    statements = ''.join(f"INSERT INTO bulk (name, value) VALUES ('item{i}', {i});\n" for i in range(BULK_ROWS))
+
+    with timed('bulk insert (one transaction)', BULK_ROWS):
+        js.sqlDb.exec('BEGIN;\n' + statements + 'COMMIT;')
+    with timed('bulk scan', BULK_ROWS):
+        results = js.sqlDb.query('SELECT id, name, value FROM bulk')
+
+    assert len(results[0].values) == BULK_ROWS
+    assert sum(row[2] for row in results[0].values) == sum(range(BULK_ROWS))
+    assert TIMINGS['bulk insert (one transaction)'] < BULK_BUDGET_SECONDS
+
+def test_bulk_kv(js):
+    with timed('kv set', BULK_ROWS):
+        for i in range(BULK_ROWS):
+            js.sqlDb.set(f'key{i}', {'n': i})
+    with timed('kv get', BULK_ROWS):
+        values = [js.sqlDb.get(f'key{i}') for i in range(BULK_ROWS)]
+
+    assert values[-1] == {'n': BULK_ROWS - 1}
+    assert TIMINGS['kv set'] < BULK_BUDGET_SECONDS
+    assert TIMINGS['kv get'] < BULK_BUDGET_SECONDS
+
+def test_hash_fields(js):
+    import codemate_db
+    db = codemate_db.Database()
+    for name in ('carol', 'alice', 'bob'):
+        db.hset('users', name, {'name': name.title()})
+
+    assert db.hget('users', 'alice') == {'name': 'Alice'}
+    assert db.hget('users', 'dave', 'none') == 'none'
+    cursor, page = db.hscan('users', count=2)
+    assert (cursor, list(page)) == ('bob', ['alice', 'bob'])
+    assert db.hscan('users', cursor, count=2) == ('', {'carol': {'name': 'Carol'}})
+    assert list(db.hgetall('users')) == ['alice', 'bob', 'carol']
+
+    db.hdel('users', 'bob')
+    assert db.hget('users', 'bob') is None
+    assert list(db.hgetall('users')) == ['alice', 'carol']
+
+def test_hash_cache_follows_remote_updates(js):
+    import codemate_db
+    db = codemate_db.Database()
+    db.hset('users', 'alice', {'name': 'Alice'})
+    assert db.hget('users', 'alice') == {'name': 'Alice'}
+
+    # Writes from other peers arrive through js.db, not this wrapper
+    js.db.hset('users', 'alice', {'name': 'Alicia'})
+    assert db.hget('users', 'alice') == {'name': 'Alicia'}
+    js.db.hdel('users', 'alice')
+    assert db.hget('users', 'alice') is None
+
+    # An evicted namespace takes its cached fields with it
+    db.hset('users', 'bob', {'name': 'Bob'})
+    js.db._notify_hash_change('users', None)
+    assert ('users', 'bob') not in db.cache.entries
+
+def test_hash_index_loading_is_not_an_empty_hash(js):
+    import codemate_db
+    db = codemate_db.Database()
+    js.db.loading.add('users')
+    with pytest.raises(codemate_db.HashIndexLoading):
+        db.hscan('users')
+    with pytest.raises(codemate_db.HashIndexLoading):
+        db.hget('users', 'alice')
+
+    # Fields that have already arrived can be read
+    js.db.hset('users', 'alice', {'name': 'Alice'})
+    assert db.hget('users', 'alice') == {'name': 'Alice'}
+
+def test_demo_users_paging(js, monkeypatch):
+    demo_flask_app = pytest.importorskip('demo_flask_app')
+    import codemate_db
+    monkeypatch.setattr(demo_flask_app, 'db', codemate_db.Database(), raising=False)
+    client = demo_flask_app.app.test_client()
+    js.db.set('users', {f'u{i}': {'name': f'User {i}'} for i in range(5)})
+
+    # The first listing moves the old blob into the users namespace
+    first = client.get('/api/db/users?count=2').get_json()
+    assert js.db.get('users') is None
+    assert (first['count'], first['cursor']) == (2, 'u1')
+    second = client.get(f"/api/db/users?count=2&cursor={first['cursor']}").get_json()
+    third = client.get(f"/api/db/users?count=2&cursor={second['cursor']}").get_json()
+    assert list(second['users']) == ['u2', 'u3']
+    assert (list(third['users']), third['cursor']) == (['u4'], '')
+
+    client.put('/api/db/users/u4', json={'name': 'Renamed'})
+    assert client.get('/api/db/users/u4').get_json()['user'] == {'name': 'Renamed'}
+    assert client.get('/api/db/users/u9').status_code == 404
+
+    js.db.loading.add('users')
+    response = client.get('/api/db/users')
+    assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+
+def test_bulk_import_export_listing(client, js, monkeypatch):
+    body = 'name,email\n' + ''.join(f'user{i},user{i}@example.com\n' for i in range(BULK_ROWS))
+    persists = []
+    monkeypatch.setattr(js.sqlDb, 'persist', lambda: persists.append(True))
+
+    with timed('csv import', BULK_ROWS):
+        lines = client.post('/api/import/users', data=body, content_type='text/csv').get_data(as_text=True)
+    progress = [json.loads(line) for line in lines.splitlines()]
+    assert progress[-1] == {'done': True, 'rows': BULK_ROWS, 'chunks': progress[-1]['chunks']}
+    # Chunks are committed without exporting; the database is saved once
+    assert len(persists) == 1
+
+    with timed('users listing', BULK_ROWS):
+        users = client.get('/api/users').get_json()
+    assert len(users) == BULK_ROWS
+
+    with timed('ndjson export', BULK_ROWS):
+        exported = client.get('/api/export/users?format=ndjson').get_data(as_text=True)
+    assert len(exported.splitlines()) == BULK_ROWS
+
+    for label in ('csv import', 'users listing', 'ndjson export'):
+        assert TIMINGS[label] < BULK_BUDGET_SECONDS
+
+def test_failed_final_chunk_is_not_counted(client, monkeypatch):
+    import flask_sql_example
+    monkeypatch.setattr(flask_sql_example, 'IMPORT_CHUNK_ROWS', 2)
+    body = 'name,email\na,a@example.com\nb,b@example.com\nc,c@example.com\nd,c@example.com\n'
+    lines = client.post('/api/import/users', data=body, content_type='text/csv').get_data(as_text=True)
+    result = json.loads(lines.splitlines()[-1])
+    # The second chunk hit the UNIQUE email and was rolled back
+    assert result['done'] is False and 'UNIQUE' in result['error']
+    assert (result['rows'], result['chunks']) == (2, 1)
+    emails = {user['email'] for user in client.get('/api/users').get_json()}
+    assert {'a@example.com', 'b@example.com'} <= emails and 'c@example.com' not in emails
+
+def test_export_import_round_trip_keeps_derived_state(client):
+    client.post('/api/users', json={'name': 'Ann', 'email': 'ann@example.com'})
+    ann = client.get('/api/users').get_json()[0]
+    for title in ('First', 'Second'):
+        client.post('/api/posts', json={'title': title, 'content': 'Hello', 'user_id': ann['id']})
+    exported = {table: client.get(f'/api/export/{table}').get_data(as_text=True)
+                for table in ('users', 'posts')}
+
+    # Load into a fresh database, posts before their author
+    fake_js.install()
+    assert client.post('/api/init-db').get_json()['success']
+    for table in ('posts', 'users'):
+        lines = client.post(f'/api/import/{table}', data=exported[table],
+                            content_type='text/csv').get_data(as_text=True)
+        assert json.loads(lines.splitlines()[-1])['done']
+
+    top = client.get('/api/users/top?limit=1').get_json()
+    assert [(user['name'], user['post_count']) for user in top] == [('Ann', 2)]
+    posts = client.get('/api/posts').get_json()
+    assert [(post['title'], post['author_name']) for post in posts] == [('Second', 'Ann'), ('First', 'Ann')]
+
+    # Importing users on top of their posts doesn't count them twice
+    client.post('/api/import/users', data='name,email,post_count\nBob,bob@example.com,7\n',
+                content_type='text/csv')
+    top = client.get('/api/users/top').get_json()
+    assert [(user['name'], user['post_count']) for user in top] == [('Ann', 2), ('Bob', 0)]
+
+def test_import_refuses_internal_tables_and_views(client, js):
+    js.sqlDb.exec('CREATE VIEW user_names AS SELECT name FROM users')
+    for table in ('posts_feed', 'tombstones', 'sqlite_sequence', 'user_names'):
+        response = client.post(f'/api/import/{table}', data='name\nx\n', content_type='text/csv')
+        assert response.status_code == 400, table
+
+def test_export_refuses_tables_without_rowid(client, js):
+    js.sqlDb.exec('CREATE VIEW user_names AS SELECT name FROM users')
+    js.sqlDb.exec('CREATE TABLE tags (name TEXT PRIMARY KEY) WITHOUT ROWID')
+    for table in ('user_names', 'tags'):
+        assert client.get(f'/api/export/{table}').status_code == 400, table
+
+    # A column named rowid doesn't throw the paging off
+    js.sqlDb.exec("CREATE TABLE shadow (rowid TEXT); INSERT INTO shadow VALUES ('b'), ('a')")
+    assert client.get('/api/export/shadow').get_data(as_text=True).split() == ['rowid', 'b', 'a']
+
+def test_wsgi_adapter_passes_body_query_and_headers(client):
+    import flask_sql_example
+    body = b'{"name": "Ann", "email": "ann@example.com"}\n{"name": "Bob", "email": "bob@example.com"}\n'
+    # The format comes from the query string; the Content-Type alone would mean CSV
+    status, headers, result = codemate_wsgi.handle_request(
+        flask_sql_example.app, 'POST', '/api/import/users', 'format=ndjson',
+        {'Content-Type': 'text/plain'}, body)
+    assert status == 200 and headers['Content-Type'] == 'application/x-ndjson'
+    assert json.loads(result.splitlines()[-1]) == {'done': True, 'rows': 2, 'chunks': 1}
+
+    status, _, result = codemate_wsgi.handle_request(flask_sql_example.app, 'GET', '/api/users')
+    assert sorted(user['name'] for user in json.loads(result)) == ['Ann', 'Bob']
+
+def test_wsgi_adapter_joins_streamed_responses(client, monkeypatch):
+    import flask_sql_example
+    monkeypatch.setattr(flask_sql_example, 'EXPORT_CHUNK_ROWS', 2)
+    body = 'name,email\n' + ''.join(f'user{i},user{i}@example.com\n' for i in range(5))
+    client.post('/api/import/users', data=body, content_type='text/csv')
+
+    # Three pages of rows plus the header, streamed from a generator
+    status, headers, result = codemate_wsgi.handle_request(
+        flask_sql_example.app, 'GET', '/api/export/users', 'format=csv')
+    assert status == 200
+    assert headers['Content-Disposition'] == 'attachment; filename="users.csv"'
+    lines = result.decode().splitlines()
+    assert lines[0].startswith('id,name,email')
+    assert [line.split(',')[1] for line in lines[1:]] == [f'user{i}' for i in range(5)]
+
+def test_wsgi_adapter_keeps_response_state_per_request():
+    def app(environ, start_response):
+        if environ['PATH_INFO'] == '/inner':
+            start_response('404 Not Found', [('X-Request', 'inner')])
+            return [b'inner']
+        # A nested request completes before this one starts its response
+        inner = codemate_wsgi.handle_request(app, 'GET', '/inner')
+        write = start_response('200 OK', [('X-Request', 'outer'), ('X-Request', 'again')])
+        write(b'written ')
+        return (chunk for chunk in [b'from ', b'', inner[2]])
+
+    assert codemate_wsgi.handle_request(app, 'GET', '/outer') == (
+        200, {'X-Request': 'outer, again'}, b'written from inner')
+
+def test_response_cache_sees_writes_from_other_workers(tmp_path):
+    pytest.importorskip('flask')
+    serve_multiprocess = pytest.importorskip('serve_multiprocess')
+    db_path = str(tmp_path / 'shared.db')
+    serve_multiprocess._prepare_database(db_path)
+
+    # Two pools on one WAL file stand in for two worker processes
+    js = serve_multiprocess._install_js(db_path, 2)
+    other_worker = serve_multiprocess.PooledSQLDatabase(db_path, 1)
+    import flask_sql_example
+    cached_app = serve_multiprocess.ResponseCache(flask_sql_example.app, js.sqlDb)
+
+    assert codemate_wsgi.handle_request(cached_app, 'GET', '/api/users')[2] == b'[]'
+    assert len(cached_app.entries) == 1
+
+    other_worker.exec("INSERT INTO users (name, email) VALUES ('Ann', 'ann@example.com')")
+    status, _, body = codemate_wsgi.handle_request(cached_app, 'GET', '/api/users')
+    assert status == 200
+    assert [user['name'] for user in json.loads(body)] == ['Ann']
+
+def test_response_cache_sees_schema_changes(tmp_path):
+    pytest.importorskip('flask')
+    serve_multiprocess = pytest.importorskip('serve_multiprocess')
+    db_path = str(tmp_path / 'shared.db')
+    serve_multiprocess._prepare_database(db_path)
+    js = serve_multiprocess._install_js(db_path, 1)
+    import flask_sql_example
+    cached_app = serve_multiprocess.ResponseCache(flask_sql_example.app, js.sqlDb)
+
+    def table_count():
+        status, _, body = codemate_wsgi.handle_request(cached_app, 'GET', '/api/stats')
+        assert status == 200
+        return json.loads(body)['table_count']
+
+    before = table_count()
+    # CREATE TABLE changes no rows, only the schema
+    status, _, _ = codemate_wsgi.handle_request(
+        cached_app, 'POST', '/api/query', headers={'Content-Type': 'application/json'},
+        body=json.dumps({'query': 'CREATE TABLE notes (body TEXT)'}))
+    assert status == 200
+    assert table_count() == before + 1
+
+def test_unread_cursors_do_not_exhaust_the_pool(tmp_path):
+    pytest.importorskip('flask')
+    serve_multiprocess = pytest.importorskip('serve_multiprocess')
+    db_path = str(tmp_path / 'shared.db')
+    serve_multiprocess._prepare_database(db_path)
+    js = serve_multiprocess._install_js(db_path, 1)
+    import flask_sql_example
+
+    client = flask_sql_example.app.test_client()
+    for i in range(3):
+        client.post('/api/users', json={'name': f'user{i}', 'email': f'user{i}@example.com'})
+    cursor_ids = [client.post('/api/query', json={'query': 'SELECT id FROM users', 'cursor': True,
+                                                  'page_size': 1}).get_json()['cursor_id'] for _ in range(3)]
+
+    # The single pooled connection is still free for other requests
+    assert js.sqlDb.pool.qsize() == 1
+    assert len(client.get('/api/users').get_json()) == 3
+    for cursor_id in cursor_ids:
+        assert client.delete(f'/api/query/cursor/{cursor_id}').get_json()['success']
+    assert js.sqlDb.cursors == {}
+
+def test_per_request_profiling(client, monkeypatch):
+    import flask_sql_example
+    profiler = flask_sql_example.app.wsgi_app.profiler
+    monkeypatch.setattr(profiler, 'admin_token', 'admin-secret')
+    # Sample on every call/return so a sub-millisecond request still shows its handler
+    monkeypatch.setattr(profiler, 'interval', 0)
+    client.post('/api/users', json={'name': 'Ann', 'email': 'ann@example.com'})
+
+    # Unflagged requests are untouched; a wrong token is refused
+    assert 'X-Profile-Id' not in client.get('/api/posts').headers
+    assert client.get('/api/posts', headers={'X-CodeMate-Profile': 'guess'}).status_code == 403
+    assert client.get('/api/debug/profile').status_code == 403
+    assert client.get('/api/posts?__profile=%C3%A9').status_code == 403
+    assert client.get('/api/posts', headers={'X-CodeMate-Profile': 'caf\xe9'}).status_code == 403
+
+    response = client.get('/api/posts', headers={'X-CodeMate-Profile': 'admin-secret'})
+    assert response.status_code == 200 and response.get_json() == []
+    profile_id = response.headers['X-Profile-Id']
+    assert profile_id.startswith(f'{os.getpid()}-')
+    assert client.get('/api/debug/profile/0-1?__profile=admin-secret').status_code == 404
+
+    one = client.get(f'/api/debug/profile/{profile_id}?__profile=admin-secret').get_data(as_text=True)
+    assert 'handle_posts' in one
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in one.splitlines())
+
+    collapsed = client.get('/api/users?__profile=admin-secret&__profile_output=collapsed').get_data(as_text=True)
+    assert 'handle_users' in collapsed
+
+    aggregate = client.get('/api/debug/profile?format=json', headers={'X-CodeMate-Profile': 'admin-secret'}).get_json()
+    assert [p['path'] for p in aggregate['profiles']][-2:] == ['/api/posts', '/api/users']
+    assert any('handle_posts' in stack for stack in aggregate['stacks'])
+
+def test_profile_token_set_at_runtime(client, monkeypatch):
+    import codemate_profiler
+    monkeypatch.delenv(codemate_profiler.TOKEN_ENV, raising=False)
+    headers = {'X-CodeMate-Profile': 'runtime-secret'}
+    assert client.get('/api/posts', headers=headers).status_code == 403
+
+    # The running app picks the token up without being reinstalled
+    codemate_profiler.set_admin_token('runtime-secret')
+    assert 'X-Profile-Id' in client.get('/api/posts', headers=headers).headers
+
+    codemate_profiler.set_admin_token(None)
+    assert client.get('/api/posts', headers=headers).status_code == 403
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main(['-q', '-s', __file__]))
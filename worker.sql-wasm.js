@@ -198,9 +198,105 @@ else if (typeof exports === 'object'){
 
 var db;
 
+// Like db.exec, but checks a wall-clock deadline and a row cap after every
+// step. A single step that runs past the deadline (a sort or aggregate over a
+// huge join) can't be interrupted from here; CodeMateSQLDB terminates the
+// worker in that case and reopens the database in a new one.
+function execWithBudget(sql, params, timeoutMs, maxRows) {
+    var deadline = timeoutMs ? Date.now() + timeoutMs : Infinity;
+    var results = [];
+    var statements = db.iterateStatements(sql);
+    var stmt;
+    for (var next = statements.next(); !next.done; next = statements.next()) {
+        stmt = next.value;
+        try {
+            if (params) {
+                stmt.bind(params);
+                params = null;
+            }
+            var columns = stmt.getColumnNames();
+            var values = [];
+            var truncated = false;
+            while (stmt.step()) {
+                if (Date.now() > deadline) {
+                    throw new Error("interrupted: query exceeded its " + timeoutMs + " ms budget");
+                }
+                if (maxRows && values.length >= maxRows) {
+                    truncated = true;
+                    break;
+                }
+                values.push(stmt.get());
+            }
+            if (columns.length > 0) {
+                results.push({ columns: columns, values: values, truncated: truncated });
+            }
+        } catch (error) {
+            stmt.free();
+            throw error;
+        }
+    }
+    return results;
+}
+
+// Open server-side cursors: prepared statements stepped a page at a time,
+// so large results never have to be materialized in one message. sql.js frees
+// every prepared statement on export() and close(), so both drop all cursors.
+var cursors = {};
+var nextCursorId = 1;
+
+function openCursor(sql, params) {
+    var stmt = db.prepare(sql, params);
+    var cursorId = nextCursorId++;
+    cursors[cursorId] = stmt;
+    return { cursorId: cursorId, columns: stmt.getColumnNames() };
+}
+
+function fetchCursor(cursorId, n, timeoutMs) {
+    var stmt = cursors[cursorId];
+    if (!stmt) {
+        throw new Error("Unknown cursor: " + cursorId);
+    }
+    // A page cut short by the deadline is still valid; the caller fetches again
+    var deadline = timeoutMs ? Date.now() + timeoutMs : Infinity;
+    var values = [];
+    var done = false;
+    try {
+        while (values.length < n) {
+            if (!stmt.step()) {
+                done = true;
+                break;
+            }
+            values.push(stmt.get());
+            if (Date.now() > deadline) {
+                break;
+            }
+        }
+    } catch (error) {
+        // Freed behind our back; report it like any other dead cursor
+        if (error === "Statement closed") {
+            delete cursors[cursorId];
+            throw new Error("Unknown cursor: " + cursorId);
+        }
+        throw error;
+    }
+    if (done) {
+        closeCursor(cursorId);
+    }
+    return { values: values, done: done };
+}
+
+function closeCursor(cursorId) {
+    var stmt = cursors[cursorId];
+    if (stmt) {
+        stmt.free();
+        delete cursors[cursorId];
+    }
+}
+
 function onModuleReady(SQL) {
     function createDb(data) {
         if (db != null) db.close();
+        cursors = {};
         db = new SQL.Database(data);
         return db;
     }
@@ -227,6 +323,36 @@ function onModuleReady(SQL) {
                 id: data["id"],
                 results: db.exec(data["sql"], data["params"], config)
             });
+        case "execBudget":
+            if (db === null) {
+                createDb();
+            }
+            if (!data["sql"]) {
+                throw "execBudget: Missing query string";
+            }
+            return postMessage({
+                id: data["id"],
+                results: execWithBudget(data["sql"], data["params"], data["timeoutMs"], data["maxRows"])
+            });
+        case "cursorOpen":
+            if (db === null) {
+                createDb();
+            }
+            return postMessage({
+                id: data["id"],
+                results: openCursor(data["sql"], data["params"])
+            });
+        case "cursorFetch":
+            return postMessage({
+                id: data["id"],
+                results: fetchCursor(data["cursorId"], data["n"], data["timeoutMs"])
+            });
+        case "cursorClose":
+            closeCursor(data["cursorId"]);
+            return postMessage({
+                id: data["id"],
+                results: true
+            });
         case "each":
             if (db === null) {
                 createDb();
@@ -247,6 +373,7 @@ function onModuleReady(SQL) {
             return db.each(data["sql"], data["params"], callback, done, config);
         case "export":
             buff = db["export"]();
+            cursors = {};
             result = {
                 id: data["id"],
                 buffer: buff
@@ -260,6 +387,7 @@ function onModuleReady(SQL) {
             if (db) {
                 db.close();
             }
+            cursors = {};
             return postMessage({
                 id: data["id"]
             });